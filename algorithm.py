@@ -1,9 +1,25 @@
+import os
 import pygad
 import numpy as np
-from pymongo import MongoClient
-from database import (
-    courses_collection, users_collection, rooms_collection, timetable_collection
-)
+from database import courses_collection, users_collection, rooms_collection
+from slots import slot_fields
+from checkpoint import claimed_checkpoint, problem_key, load_checkpoint, save_checkpoint, restore_rng_state
+from snapshot import resolve_snapshot
+from ga_operators import block_operators, session_room
+from versions import save_version_entries
+
+NUM_GENERATIONS = 10000
+DAY_SLOTS = 9  # Hourly slots per day in the solution encoding (8:00 - 17:00)
+CHECKPOINT_EVERY = 50  # Generations between checkpoints
+
+# GA parameters, used as-is unless the run is adaptive
+DEFAULT_PARAMETERS = {'sol_per_pop': 200, 'num_parents_mating': 50, 'keep_parents': 10, 'mutation_probability': 0.2}
+MIN_POPULATION = 30
+MAX_POPULATION = 400
+MAX_MUTATION_RATE = 0.5
+MIN_DIVERSITY = 0.1  # Below this the population has converged and mutation is doubled
+STAGNATION_WINDOW = 50  # Generations without improvement that double the mutation rate
+STAGNATION_LIMIT = 500  # Generations without improvement before an adaptive run stops
 
 # Fetch courses, lecturers, and rooms data from the database
 def fetch_data():
@@ -42,7 +58,7 @@ def fitness_func(ga_instance, solution, solution_idx, lecturer_availability, roo
         course = courses_data[course_idx]
         lecturer_name = course['lecturer']
         student_count = course['student_count']
-        assigned_room = room_data[slot_idx % len(room_data)]
+        assigned_room = room_data[session_room(solution, slot_idx, courses_data, len(room_data), DAY_SLOTS)]
         day_index = slot_idx // 9  # Calculate the day index
 
         # Room capacity check
@@ -65,20 +81,13 @@ def fitness_func(ga_instance, solution, solution_idx, lecturer_availability, roo
         else:
             room_usage[slot_idx] = course_idx
 
-        # Ensure 2-hour sessions are in the same room
-        if course['credit_hours'] == 2:
+        # Ensure 2-hour sessions are one block on one day, checked once at the start of the block;
+        # the block's second hour is held in the room of its first (see session_room)
+        block_start = slot_idx % DAY_SLOTS == 0 or solution[slot_idx - 1] != course_idx
+        if course['credit_hours'] == 2 and block_start:
             next_slot = slot_idx + 1
-            if next_slot < len(solution):
-                next_course_idx = solution[next_slot]
-                next_room = room_data[next_slot % len(room_data)]
-
-                # Penalize if the next slot isn't the same course
-                if next_course_idx != course_idx:
-                    penalty += 20  # Penalize if not the same course
-
-                # Penalize if not in the same room
-                if next_room != assigned_room:
-                    penalty += 20  # Penalize if not in the same room
+            if next_slot % DAY_SLOTS == 0 or solution[next_slot] != course_idx:
+                penalty += 20  # Penalize if the next slot isn't the same course on the same day
 
         # Track course assignments for credit hour validation and daily limit
         course_counts[course['course_name']] += 1
@@ -88,8 +97,9 @@ def fitness_func(ga_instance, solution, solution_idx, lecturer_availability, roo
             course_counts_per_day[day_index][course['course_name']] = 0
         course_counts_per_day[day_index][course['course_name']] += 1
 
-        # Check if we exceed 2 hours in the same day
-        if course_counts_per_day[day_index][course['course_name']] > 1:
+        # Check if we exceed the daily limit: the 2-hour block for 2-credit courses, otherwise one hour
+        daily_limit = 2 if course['credit_hours'] == 2 else 1
+        if course_counts_per_day[day_index][course['course_name']] > daily_limit:
             penalty += 20  # Penalize for exceeding daily limit for the same course
 
         # Check for three consecutive slots of the same course
@@ -136,7 +146,7 @@ def repair_solution(solution, courses_data, room_data):
                     slots_to_add >= 2
                     and solution[idx] == -1
                     and solution[idx + 1] == -1
-                    and room_data[idx % len(room_data)] == room_data[(idx + 1) % len(room_data)]
+                    and (idx + 1) % DAY_SLOTS != 0  # Both hours on the same day
                 ):
                     solution[idx] = course_idx
                     solution[idx + 1] = course_idx
@@ -147,42 +157,143 @@ def repair_solution(solution, courses_data, room_data):
 
     return solution
 
-# Run the genetic algorithm
-def run_genetic_algorithm():
-    courses_data, lecturer_data, room_data = fetch_data()
-    num_time_slots = 45  # 9 time slots * 5 days
+# Run the genetic algorithm.
+# With a checkpoint_path, the population, best solution, generation counter and RNG state are
+# written every checkpoint_every generations; resume=True continues from that checkpoint.
+# A snapshot (or snapshot path) replaces the live collections as the problem input.
+# adaptive=True sizes the search to the problem and tunes mutation while it runs.
+def run_genetic_algorithm(checkpoint_path=None, checkpoint_every=CHECKPOINT_EVERY, resume=False, snapshot=None,
+                          adaptive=False):
+    snapshot = resolve_snapshot(snapshot)
+    courses_data, lecturer_data, room_data = snapshot.problem() if snapshot else fetch_data()
+    return solve_problem(courses_data, lecturer_data, room_data, checkpoint_path, checkpoint_every, resume,
+                         adaptive=adaptive)
+
+# Population and parent counts scaled to the search space (courses x time slots)
+def adaptive_parameters(num_courses, num_genes):
+    sol_per_pop = int(min(MAX_POPULATION, max(MIN_POPULATION, 4 * np.sqrt(max(num_courses, 1) * num_genes))))
+    return {
+        'sol_per_pop': sol_per_pop,
+        'num_parents_mating': max(2, sol_per_pop // 4),
+        'keep_parents': max(1, sol_per_pop // 20),
+        'mutation_probability': DEFAULT_PARAMETERS['mutation_probability'],
+    }
+
+# Share of the population that differs from the most common value of each gene, averaged over genes
+def population_diversity(population):
+    differing = []
+    for column in np.asarray(population).T:
+        counts = np.unique(column, return_counts=True)[1]
+        differing.append(1 - counts.max() / len(column))
+    return float(np.mean(differing))
+
+# Mutation rate raised while the search stagnates or the population converges, reset on improvement
+def adapted_mutation_rate(base_rate, stagnant_generations, diversity):
+    rate = base_rate * (1 + stagnant_generations / STAGNATION_WINDOW)
+    if diversity < MIN_DIVERSITY:
+        rate *= 2
+    return min(MAX_MUTATION_RATE, rate)
+
+# Run the genetic algorithm on already-loaded data (also used for per-department sub-problems).
+# parameters overrides sol_per_pop, num_parents_mating, keep_parents and mutation_probability;
+# a stats dict, if given, is filled with the generations run and the parameters used.
+def solve_problem(courses_data, lecturer_data, room_data, checkpoint_path=None, checkpoint_every=CHECKPOINT_EVERY,
+                  resume=False, num_generations=NUM_GENERATIONS, adaptive=False, parameters=None, stats=None):
+    num_time_slots = DAY_SLOTS * 5  # 9 time slots * 5 days
 
     lecturer_availability = {lecturer['username']: get_lecturer_availability(lecturer) for lecturer in lecturer_data}
     gene_space = [-1] + [i for i in range(len(courses_data))]
 
-    def fitness_wrapper(ga_instance, solution, solution_idx):
-        return fitness_func(ga_instance, solution, solution_idx, lecturer_availability, room_data, courses_data, lecturer_data)
-
-    def on_generation(ga_instance):
-        print(f"Generation {ga_instance.generations_completed}: Best Fitness = {ga_instance.best_solution()[1]}")
-
-        for idx, solution in enumerate(ga_instance.population):
-            ga_instance.population[idx] = repair_solution(solution.copy(), courses_data, room_data)
-
-    ga = pygad.GA(
-        num_generations=10000,
-        sol_per_pop=200,
-        num_parents_mating=50,
-        fitness_func=fitness_wrapper,
-        num_genes=num_time_slots,
-        gene_space=gene_space,
-        parent_selection_type="tournament",
-        crossover_type="single_point",
-        mutation_probability=0.2,
-        crossover_probability=0.8,
-        on_generation=on_generation,
-        keep_parents=10  # Elitism: retain top 10 parents
-    )
-    ga.run()
-    solution, fitness, _ = ga.best_solution()
-    return solution, fitness
-
-def save_timetable_to_db(solution, courses_data, room_data, lecturer_data):
+    params = dict(DEFAULT_PARAMETERS)
+    if adaptive:
+        params.update(adaptive_parameters(len(courses_data), num_time_slots))
+    params.update(parameters or {})
+
+    key = problem_key(courses_data, room_data, num_time_slots)
+    with claimed_checkpoint(checkpoint_path, key) as checkpoint_path:
+        checkpoint = load_checkpoint(checkpoint_path, key) if checkpoint_path and resume else None
+        start_generation = checkpoint['generations_completed'] if checkpoint else 0
+        best = {'solution': checkpoint['best_solution'], 'fitness': checkpoint['best_fitness']} if checkpoint else None
+        progress = {'best_fitness': float('-inf'), 'stagnant': 0}
+
+        # Crossover and mutation move whole course sessions instead of single genes
+        crossover_func, mutation_func = block_operators(courses_data, room_data, lecturer_availability, DAY_SLOTS)
+
+        def fitness_wrapper(ga_instance, solution, solution_idx):
+            return fitness_func(ga_instance, solution, solution_idx, lecturer_availability, room_data, courses_data, lecturer_data)
+
+        def on_generation(ga_instance):
+            nonlocal best
+            generation = start_generation + ga_instance.generations_completed
+            best_solution, fitness, _ = ga_instance.best_solution()
+            print(f"Generation {generation}: Best Fitness = {fitness}")
+
+            for idx, solution in enumerate(ga_instance.population):
+                ga_instance.population[idx] = repair_solution(solution.copy(), courses_data, room_data)
+
+            if checkpoint_path:
+                if best is None or fitness > best['fitness']:
+                    best = {'solution': best_solution.copy(), 'fitness': fitness}
+                if generation % checkpoint_every == 0:
+                    save_checkpoint(checkpoint_path, key, ga_instance.population, best['solution'], best['fitness'], generation)
+
+            if fitness > progress['best_fitness']:
+                progress['best_fitness'] = fitness
+                progress['stagnant'] = 0
+            else:
+                progress['stagnant'] += 1
+
+            if adaptive:
+                if fitness >= 1.0 or progress['stagnant'] >= STAGNATION_LIMIT:
+                    return "stop"  # Penalty-free timetable found, or no progress for a long time
+                ga_instance.mutation_probability = adapted_mutation_rate(
+                    params['mutation_probability'], progress['stagnant'], population_diversity(ga_instance.population)
+                )
+
+        remaining_generations = num_generations - start_generation
+        if checkpoint:
+            print(f"Resuming from generation {start_generation} (best fitness {best['fitness']})")
+        if remaining_generations <= 0:
+            return best['solution'], best['fitness']
+
+        ga = pygad.GA(
+            num_generations=remaining_generations,
+            sol_per_pop=params['sol_per_pop'],
+            num_parents_mating=params['num_parents_mating'],
+            fitness_func=fitness_wrapper,
+            num_genes=num_time_slots,
+            gene_space=gene_space,
+            initial_population=checkpoint['population'] if checkpoint else None,
+            parent_selection_type="tournament",
+            crossover_type=crossover_func,
+            mutation_type=mutation_func,
+            mutation_probability=params['mutation_probability'],
+            crossover_probability=0.8,
+            on_generation=on_generation,
+            keep_parents=params['keep_parents'],  # Elitism: retain the top parents
+            keep_elitism=0  # Otherwise pygad's default keep_elitism=1 takes precedence over keep_parents
+        )
+        if checkpoint:
+            restore_rng_state(checkpoint)
+        ga.run()
+        solution, fitness, _ = ga.best_solution()
+
+        if stats is not None:
+            stats['generations'] = start_generation + ga.generations_completed
+            stats['parameters'] = params
+
+        # A checkpointed run may have seen a better solution before it was interrupted
+        if best is not None and best['fitness'] > fitness:
+            solution, fitness = best['solution'], best['fitness']
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)  # The run finished, so there is nothing left to resume
+        return solution, fitness
+
+def save_timetable_to_db(solution, courses_data, room_data, lecturer_data, version_id):
+    save_entries(solution_to_entries(solution, courses_data, room_data, lecturer_data), version_id)
+
+# Timetable entries (one per occupied slot) for a solution
+def solution_to_entries(solution, courses_data, room_data, lecturer_data):
     timetable = []
 
     # Update lecturer mapping to include department information
@@ -211,19 +322,21 @@ def save_timetable_to_db(solution, courses_data, room_data, lecturer_data):
         department = lecturer_details["department"]
 
         # Room and time slot information
-        assigned_room = room_data[slot_idx % len(room_data)]
-        room_name = assigned_room.get('room_name', f"Room-{slot_idx % len(room_data)}")
+        room_idx = session_room(solution, slot_idx, courses_data, len(room_data), DAY_SLOTS)
+        assigned_room = room_data[room_idx]
+        room_name = assigned_room.get('room_name', f"Room-{room_idx}")
 
-        day_index = slot_idx // 9
-        day = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"][day_index]
-        time_slot = f"{8 + (slot_idx % 9)}:00 - {9 + (slot_idx % 9)}:00"
-
-        # Insert the timetable entry into the database with department included
-        timetable_collection.insert_one({
+        # Timetable entry with department included and the canonical slot encoding
+        entry = {
             "course": course_info['course_name'],
             "lecturer": lecturer_name,
             "department": department,   # Added department field
             "room": room_name,
-            "day": day,
-            "time": time_slot
-        })
+        }
+        entry.update(slot_fields(slot_idx // DAY_SLOTS, slot_idx % DAY_SLOTS))
+        timetable.append(entry)
+
+    return timetable
+
+def save_entries(timetable, version_id):
+    save_version_entries(version_id, timetable)
@@ -1,4 +1,7 @@
-from database import courses_collection, users_collection, rooms_collection, timetable_collection
+from database import courses_collection, users_collection, rooms_collection
+from slots import FIRST_HOUR, day_index, slot_fields
+from snapshot import resolve_snapshot
+from versions import create_version, publish_version, save_version_entries
 import random
 import copy
 
@@ -10,6 +13,13 @@ MAX_CONSECUTIVE_HOURS = 5
 MAX_GENERATIONS = 100
 POPULATION_SIZE = 50
 MUTATION_RATE = 0.1
+SELECTION_SIZE = 10
+# Adaptive runs: population scaled to the catalogue, mutation raised while the search stagnates
+MIN_POPULATION_SIZE = 20
+MAX_POPULATION_SIZE = 200
+MAX_MUTATION_RATE = 0.5
+STAGNATION_WINDOW = 10  # Generations without improvement that double the mutation rate
+MIN_DIVERSITY = 0.2  # Below this share of distinct timetables mutation is doubled
 
 def get_courses():
     return list(courses_collection.find())
@@ -86,7 +96,8 @@ def generate_random_timetable(courses, rooms, lecturers):
 
     return timetable
 
-def fitness(timetable):
+# availability maps lecturer username -> availability; without it each lecturer is looked up in the database
+def fitness(timetable, availability=None):
     score = 0
 
     for entry in timetable:
@@ -95,7 +106,10 @@ def fitness(timetable):
 
     # Rule 1: Lecturer availability check
     for entry in timetable:
-        lecturer_slots = lecturer_availability(entry["lecturer"])
+        if availability is not None:
+            lecturer_slots = availability.get(entry["lecturer"]) or {}
+        else:
+            lecturer_slots = lecturer_availability(entry["lecturer"])
         if (entry["day"], entry["start_hour"]) in lecturer_slots:
             score += 1
 
@@ -136,63 +150,127 @@ def fitness(timetable):
     print(score)
     return score
 
-def selection(population):
-    population.sort(key=lambda x: fitness(x), reverse=True)
-    return population[:10]  # Select top 10
+def selection(population, availability=None, keep=SELECTION_SIZE):
+    population.sort(key=lambda x: fitness(x, availability), reverse=True)
+    return population[:keep]  # Select the top performers
 
 def crossover(parent1, parent2):
     point = random.randint(0, len(parent1) - 1)
     child = parent1[:point] + parent2[point:]
     return child
 
-def mutate(timetable):
-    if random.random() < MUTATION_RATE:
-        course = random.choice(timetable)
-        course["day"] = random.choice(DAYS)
-        course["start_hour"] = random.choice(HOURS)
+# (day, start_hour) positions where a session of the given duration fits in the teaching day
+# without overlapping another session in the same room or with the same lecturer
+def feasible_starts(timetable, entry, duration):
+    busy = set()
+    for other in timetable:
+        if other is entry or (other["room"] != entry["room"] and other["lecturer"] != entry["lecturer"]):
+            continue
+        busy.update((other["day"], hour) for hour in range(other["start_hour"], other["end_hour"]))
+
+    return [
+        (day, start_hour)
+        for day in DAYS
+        for start_hour in HOURS
+        if start_hour + duration <= HOURS[-1] + 1
+        and not any((day, hour) in busy for hour in range(start_hour, start_hour + duration))
+    ]
+
+def mutate(timetable, rate=MUTATION_RATE):
+    if timetable and random.random() < rate:
+        idx = random.randrange(len(timetable))
+        entry = timetable[idx]
+        options = feasible_starts(timetable, entry, entry["end_hour"] - entry["start_hour"])
+        if options:
+            # Move the whole session, keeping its duration and room; copy the entry since
+            # children share entries with their parents
+            day, start_hour = random.choice(options)
+            moved = dict(entry, day=day, start_hour=start_hour,
+                         end_hour=start_hour + entry["end_hour"] - entry["start_hour"])
+            timetable = timetable[:idx] + [moved] + timetable[idx + 1:]
     return timetable
 
-def genetic_algorithm():
-    courses = get_courses()
-    rooms = get_rooms()
-    lecturers = get_users()
+# Share of distinct timetables (by session placement) in a population
+def population_diversity(population):
+    placements = {tuple((e["day"], e["start_hour"], e["room"]) for e in timetable) for timetable in population}
+    return len(placements) / len(population)
+
+# A snapshot (or snapshot path) replaces the live collections as the problem input.
+# population_size, mutation_rate and max_generations override the module defaults;
+# adaptive=True scales the population to the number of courses and tunes mutation while it runs.
+def genetic_algorithm(snapshot=None, population_size=None, mutation_rate=None, max_generations=None, adaptive=False):
+    snapshot = resolve_snapshot(snapshot)
+    if snapshot:
+        courses, lecturers, rooms = snapshot.problem()
+    else:
+        courses = get_courses()
+        rooms = get_rooms()
+        lecturers = get_users()
+
+    # Lecturer availability is looked up in memory rather than queried for every fitness evaluation
+    availability = {lecturer["username"]: lecturer.get("availability") for lecturer in lecturers}
+
+    if population_size is None:
+        population_size = (min(MAX_POPULATION_SIZE, max(MIN_POPULATION_SIZE, 2 * len(courses)))
+                           if adaptive else POPULATION_SIZE)
+    base_rate = mutation_rate if mutation_rate is not None else MUTATION_RATE
+    rate = base_rate
+    keep = max(2, population_size // 5) if adaptive else SELECTION_SIZE
+    best_score = None
+    stagnant = 0
 
     # Initialize a random population
-    population = [generate_random_timetable(courses, rooms, lecturers) for _ in range(POPULATION_SIZE)]
+    population = [generate_random_timetable(courses, rooms, lecturers) for _ in range(population_size)]
 
     # Evolve for a fixed number of generations
-    for generation in range(MAX_GENERATIONS):
-        population = selection(population)  # Select top performers
+    for generation in range(max_generations or MAX_GENERATIONS):
+        population = selection(population, availability, keep)  # Select top performers
         new_population = []
 
-        while len(new_population) < POPULATION_SIZE:
+        if adaptive:
+            score = fitness(population[0], availability)
+            if best_score is None or score > best_score:
+                best_score, stagnant = score, 0
+            else:
+                stagnant += 1
+            rate = base_rate * (1 + stagnant / STAGNATION_WINDOW)
+            if population_diversity(population) < MIN_DIVERSITY:
+                rate *= 2
+            rate = min(MAX_MUTATION_RATE, rate)
+
+        while len(new_population) < population_size:
             parent1, parent2 = random.sample(population, 2)
             child = crossover(parent1, parent2)
-            child = mutate(child)
+            child = mutate(child, rate)
             new_population.append(child)
 
         population = new_population  # Update population
 
     # Get the best timetable from the final population
-    best_timetable = max(population, key=lambda x: fitness(x))
+    best_timetable = max(population, key=lambda x: fitness(x, availability))
     return best_timetable
 
 def store_timetable(timetable):
-    # First, clear the old entries (optional, to avoid duplicate schedules)
-    timetable_collection.delete_many({})
+    # The entries go into a new version that replaces the published one; older versions are
+    # kept (and eventually compacted) rather than cleared
+    version_id = create_version('algorithm1')
 
     # Insert new timetable entries
     formatted_entries = []
     for entry in timetable:
-        formatted_entries.append({
-            "course": entry["course"],
+        formatted_entry = {
+            "course": entry["course"]["course_name"],  # Stored by name, like the other solvers
             "lecturer": entry["lecturer"],
             "room": entry["room"],
-            "day": entry["day"],
-            "start_hour": entry["start_hour"],
-            "end_hour": entry["end_hour"],
             "department": entry["department"]
-        })
-
-    timetable_collection.insert_many(formatted_entries)
+        }
+        formatted_entry.update(slot_fields(
+            day_index(entry["day"]),
+            entry["start_hour"] - FIRST_HOUR,
+            entry["end_hour"] - entry["start_hour"]
+        ))
+        formatted_entries.append(formatted_entry)
+
+    save_version_entries(version_id, formatted_entries)
+    publish_version(version_id)
     print(f"Stored {len(formatted_entries)} timetable entries successfully.")
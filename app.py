@@ -1,37 +1,52 @@
 from flask import jsonify, request, session, render_template, redirect, flash
+import io
 import json
+import os
+import queue
 import datetime
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from flask_pymongo import PyMongo
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, abort
+from flask import Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
-from algorithm import run_genetic_algorithm, save_timetable_to_db  # Import the separated algorithm
 from bson.objectid import ObjectId  # Ensure you import ObjectId
+from database import (
+    courses_collection, users_collection, rooms_collection, timetable_collection, request_collection,
+    ensure_indexes
+)
+from bulk_import import IMPORTERS, detect_format, import_rows
+from exports import FORMATS, ENTITY_TYPES, find_export, publish_exports
+from notifications import hub, publish_event
+from profiling import RunProfiler, profiling_enabled
+from request_batch import accept_request_batch
+from slots import DAYS, SLOTS_PER_DAY, covered_slots, format_time, parse_timeslot, slot_in_day
+from versions import (
+    active_query, active_version_id, compact_versions, create_version, diff_versions, list_versions,
+    previous_version_id, publish_version, update_version
+)
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"  # Subject to change
 
-# Configuring MongoDB
-app.config["MONGO_URI"] = "mongodb://localhost:27017/college_timetable"
-mongo = PyMongo(app)
+# Where long timetable generation runs keep their resumable checkpoints (one file per problem)
+GA_CHECKPOINT_PATH = os.environ.get('GA_CHECKPOINT_PATH', 'checkpoints/timetable_ga.npz')
 
-# Collections for different entities
-rooms_collection = mongo.db.rooms
-courses_collection = mongo.db.courses
-users_collection = mongo.db.users
-request_collection = mongo.db.requests
-timetable_collection = mongo.db.timetables
-
-# Expose collections by making them importable
+# Collections come from the shared, lazily-connected client in database.py;
+# they stay importable from here as before
 __all__ = ['courses_collection', 'users_collection', 'rooms_collection', 'timetable_collection']
 
+@app.before_request
+def prepare_database():
+    # Indexes are created on the first request of each worker rather than at import
+    ensure_indexes()
+
 @app.before_request
 def check_if_logged_in():
     # Define all endpoints that are restricted to certain users
     admin_endpoints = [
         'generate_timetable', 'room_page', 'add_room', 'course_list',
         'add_course', 'lecturer_page', 'admin_requests', 'accept_request',
-        'reject_request', 'room_stats', 'timetable_view', 'admin_dashboard'
+        'accept_requests', 'reject_request', 'bulk_import', 'room_stats', 'timetable_view', 'admin_dashboard',
+        'timetable_versions', 'publish_timetable_version', 'diff_timetable_versions', 'compact_timetable_versions'
     ]
     lecturer_endpoints = [
         'lecturer_dashboard', 'lecturer_courses', 'lecturer_timetable', 
@@ -116,7 +131,7 @@ def student_dashboard():
     
     student_name = session.get('username')
     department = session.get('department')  # Get student's department from session
-    timetable = list(timetable_collection.find({"department": department}))  # Fetch timetable for the lecturer
+    timetable = list(timetable_collection.find(active_query({"department": department})))  # Fetch timetable for the lecturer
 
     # Print for debugging
     print("Timetable Data:", timetable)
@@ -148,19 +163,62 @@ def generate_timetable():
         lecturer_data = list(users_collection.find({'role': 'lecturer'}))
         room_data = list(rooms_collection.find())
 
-        # Run the genetic algorithm with the selected courses
-        timetable_solution, fitness = run_genetic_algorithm()
+        # The solver stack (pygad, NumPy) is only imported when a timetable is generated
+        from algorithm import run_genetic_algorithm, save_timetable_to_db, save_entries
+
+        # Optional cProfile of the whole run; the summary is stored with the run record
+        run_name = datetime.now().strftime('run-%Y%m%d-%H%M%S')
+        profiler = RunProfiler(run_name, enabled=profiling_enabled(request.form.get('profile') == 'on'))
+        draft = request.form.get('draft') == 'on'
+
+        if request.form.get('decompose') == 'on':
+            # Solve each department in its own process, then merge and repair shared-room clashes
+            from decompose import run_decomposed
+
+            version_id = create_version('decompose', run=run_name)
+            with profiler:
+                entries, report = run_decomposed(adaptive=request.form.get('adaptive') == 'on')
+                save_entries(entries, version_id)
+            if profiler.skipped:
+                flash('Another run was already being profiled, so this run was not profiled.', 'warning')
+            update_version(
+                version_id,
+                fitness=min(report['fitness'].values(), default=0),
+                department_fitness=[{'department': d, 'fitness': f} for d, f in report['fitness'].items()],
+                repaired_sessions=report['repaired'],
+                unplaced_sessions=report['unplaced'],
+                profile=profiler.summary
+            )
 
-        # Generate the detailed timetable for display and saving
-        detailed_timetable = save_timetable_to_db(timetable_solution, selected_courses, room_data, lecturer_data)
+            if not draft:
+                activate_version(version_id)
+            flash(f"Timetable generated by department: {report['repaired']} sessions moved, "
+                  f"{len(report['unplaced'])} could not be placed.", 'success')
+            return redirect(url_for('generate_timetable'))
 
-        # Save the generated timetable into the database
-        timetable_collection.insert_one({
-            'timetable': detailed_timetable,
-            'fitness': fitness
-        })
+        version_id = create_version('genetic_algorithm', run=run_name)
+        with profiler:
+            # Run the genetic algorithm with the selected courses, checkpointing so an
+            # interrupted run can be resumed from the form
+            timetable_solution, fitness = run_genetic_algorithm(
+                checkpoint_path=GA_CHECKPOINT_PATH,
+                resume=request.form.get('resume') == 'on',
+                adaptive=request.form.get('adaptive') == 'on'
+            )
 
-        flash('Timetable successfully generated and saved!', 'success')
+            # Save the timetable entries under the new version
+            save_timetable_to_db(timetable_solution, selected_courses, room_data, lecturer_data, version_id)
+        if profiler.skipped:
+            flash('Another run was already being profiled, so this run was not profiled.', 'warning')
+
+        # The run summary is kept on the version document
+        update_version(version_id, fitness=float(fitness), profile=profiler.summary)
+
+        if draft:
+            flash(f'Timetable saved as draft version {version_id}.', 'success')
+        else:
+            activate_version(version_id)
+            flash('Timetable successfully generated and saved!', 'success')
         return redirect(url_for('generate_timetable'))
 
     # Fetch available courses from the database
@@ -252,6 +310,31 @@ def add_course():
 
     return redirect(url_for('course_list'))
 
+# Bulk import of courses, rooms or users from an uploaded CSV/JSON file (Admin only)
+@app.route('/admin/import/<kind>', methods=['POST'])
+def bulk_import(kind):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    if kind not in IMPORTERS:
+        return jsonify({"error": f"Unknown import type: {kind}"}), 404
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    fmt = detect_format(upload.filename)
+    if fmt not in ('csv', 'json', 'jsonl'):
+        return jsonify({"error": "File must be .csv, .json or .jsonl"}), 400
+
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    try:
+        report = import_rows(kind, stream, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not read file: {e}"}), 400
+
+    return jsonify(report), 200
+
 # Lecturer management page (Admin only)
 @app.route('/lecturerlist')
 def lecturer_page():
@@ -268,7 +351,7 @@ def admin_requests():
         return redirect(url_for('login'))
 
     # Retrieve all requests from the database
-    requests = list(request_collection.find({'status' : 'pending'}))  # This will return an empty list if there are no requests
+    requests = list(request_collection.find({'status' : 'pending'}).sort('submitted_at', 1))  # This will return an empty list if there are no requests
 
     return render_template('request.html', requests=requests)
 
@@ -277,44 +360,41 @@ def accept_request(request_id):
     if 'user_id' not in session or session.get('role') != 'admin':
         return jsonify({"error": "Unauthorized"}), 403
 
-    # Retrieve the request
-    request = request_collection.find_one({"_id": ObjectId(request_id)})
-    if not request:
+    # Same path as the batch approval, so a request is checked and applied identically either way
+    result = accept_request_batch([request_id], request_collection, timetable_collection, active_version_id())
+    if result['not_found']:
         return jsonify({"error": "Request not found"}), 404
+    if result['conflicts']:
+        return jsonify({"error": result['conflicts'][0]['reason'], "conflicts": result['conflicts']}), 409
 
-    # Extract the requested slot and details
-    slot_details = request.get("timeslots")  # Example format: 'Wednesday 13:00 - 14:00'
-    slot_id = request.get("slot_id")
-    replacement_type = request.get("replacement_type")
-
-    if replacement_type == "permanent":
-        # Split slot_details into day and time components
-        if slot_details:
-            day, time_range = slot_details.split(' ', 1)  # Splits into day and time
-
-            # Update the timetable with the separated details
-            timetable_collection.update_one(
-                {"_id": ObjectId(slot_id)},
-                {"$set": {
-                    "day": day,
-                    "time": time_range,
-                }}
-            )
+    if result['moved']:
+        affected = result['affected']
+        publish_timetable(lecturers=affected['lecturers'], rooms=affected['rooms'],
+                          departments=affected['departments'])
 
-        # Update the request's status to accepted
-        request_collection.update_one(
-            {"_id": ObjectId(request_id)},
-            {"$set": {"status": "Accepted"}}
-        )
-    else:
-        # Update the request's status to accepted
-        request_collection.update_one(
-            {"_id": ObjectId(request_id)},
-            {"$set": {"status": "Accepted"}}
-        )
+    return jsonify({"message": "Request accepted successfully!"}), 200
 
+@app.route('/admin/accept_requests', methods=['POST'])
+def accept_requests():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
 
-    return jsonify({"message": "Request accepted successfully!"}), 200
+    # Accept either a JSON body {"request_ids": [...]} or a form list of request_ids
+    payload = request.get_json(silent=True)
+    request_ids = payload.get('request_ids') if isinstance(payload, dict) else None
+    if request_ids is None:
+        request_ids = request.form.getlist('request_ids')
+    if not isinstance(request_ids, list) or not all(isinstance(request_id, str) for request_id in request_ids):
+        return jsonify({"error": "request_ids must be a list of request ids"}), 400
+    if not request_ids:
+        return jsonify({"error": "No requests selected"}), 400
+
+    result = accept_request_batch(request_ids, request_collection, timetable_collection, active_version_id())
+    if result['moved']:
+        affected = result['affected']
+        publish_timetable(lecturers=affected['lecturers'], rooms=affected['rooms'],
+                          departments=affected['departments'])
+    return jsonify(result), 200
 
 @app.route('/admin/reject_request/<request_id>', methods=['POST'])
 def reject_request(request_id):
@@ -340,14 +420,9 @@ def room_stats():
     if 'user_id' not in session or session.get('role') != 'admin':
         return redirect(url_for('login'))
 
-    # Fetch all timetable entries
-    timetable_entries = list(timetable_collection.find())
-
-    # Initialize a dictionary to hold room usage stats
+    # Count bookings per room in the published timetable
     room_usage = {}
-
-    # Count bookings per room
-    for entry in timetable_entries:
+    for entry in timetable_collection.find(active_query(), {'room': 1, '_id': 0}):
         room = entry.get('room')  # Safely get room name
         if room:  # Check if room is not None or empty
             if room not in room_usage:
@@ -374,8 +449,8 @@ def timetable_view():
 
     # Fetch all lecturers, rooms, and departments from the database
     lecturers = users_collection.find({'role':'lecturer'}, {'username': 1, '_id': 0})
-    rooms = timetable_collection.distinct('room')
-    departments = timetable_collection.distinct('department')
+    rooms = timetable_collection.distinct('room', active_query())
+    departments = timetable_collection.distinct('department', active_query())
 
     return render_template(
         'timetableview.html',
@@ -397,12 +472,15 @@ def get_timetable(entity_type, entity_name):
     elif entity_type == 'department':
         query = {'department': entity_name}
 
-    # Find all relevant timetable entries
-    timetable_entries = timetable_collection.find(query)
+    # Find all relevant timetable entries in the published version
+    timetable_entries = timetable_collection.find(active_query(query))
     
     # Prepare data for JSON response
     timetable_data = [
         {
+            'day_index': entry['day_index'],
+            'start_slot': entry['start_slot'],
+            'duration': entry['duration'],
             'day': entry['day'],
             'time': entry['time'],
             'course': entry['course'],
@@ -413,6 +491,114 @@ def get_timetable(entity_type, entity_name):
     
     return jsonify(timetable_data)
 
+# Re-render the static per-lecturer/room/department exports after the timetable changes
+# and notify connected clients following the affected timetables
+def publish_timetable(lecturers=(), rooms=(), departments=(), everything=False):
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    # Only the affected exports are re-rendered unless the whole timetable changed
+    entities = None if everything else {'lecturer': lecturers, 'room': rooms, 'department': departments}
+    publish_exports(version, active_query(), entities)
+    publish_event('timetable_updated', version, lecturers, rooms, departments, everything)
+    return version
+
+# Make a timetable version the published one, then apply the retention policy to older versions
+def activate_version(version_id):
+    if not publish_version(version_id):
+        return False
+    publish_timetable(everything=True)
+    compact_versions()
+    return True
+
+def version_summary(version):
+    summary = {key: value for key, value in version.items() if key not in ('_id', 'department_fitness', 'unplaced_sessions')}
+    summary['id'] = str(version['_id'])
+    return summary
+
+# Timetable versions, newest first (Admin only)
+@app.route('/admin/versions')
+def timetable_versions():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify([version_summary(version) for version in list_versions()])
+
+@app.route('/admin/versions/<version_id>/publish', methods=['POST'])
+def publish_timetable_version(version_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    if not ObjectId.is_valid(version_id) or not activate_version(version_id):
+        return jsonify({"error": "Version not found or already compacted"}), 404
+    return jsonify({"message": f"Version {version_id} published"}), 200
+
+# Sessions moved, added and removed between two versions; defaults to the published version
+# against the one published before it
+@app.route('/admin/versions/diff')
+def diff_timetable_versions():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    to_version = request.args.get('to') or active_version_id()
+    from_version = request.args.get('from')
+    if any(version and not ObjectId.is_valid(str(version)) for version in (to_version, from_version)):
+        return jsonify({"error": "Invalid version id"}), 400
+    from_version = from_version or previous_version_id(to_version)
+    if not from_version or not to_version:
+        return jsonify({"error": "Two versions are needed for a diff"}), 400
+
+    return jsonify(diff_versions(from_version, to_version)), 200
+
+@app.route('/admin/versions/compact', methods=['POST'])
+def compact_timetable_versions():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify(compact_versions()), 200
+
+# Server-sent events announcing timetable changes relevant to the logged-in user
+@app.route('/events')
+def timetable_events():
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    role = session.get('role')
+    if role == 'lecturer':
+        subscriber = hub.subscribe(lecturer=session.get('lecturer_name'))
+    elif role == 'student':
+        subscriber = hub.subscribe(department=session.get('department'))
+    else:
+        subscriber = hub.subscribe(everything=True)
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscriber.queue.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'  # Lets proxies and the server notice closed connections
+                    continue
+                yield f"event: timetable\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Precomputed timetable exports (iCalendar, CSV, JSON), served with ETags for conditional GET
+@app.route('/exports/<entity_type>/<entity_name>.<fmt>')
+def timetable_export(entity_type, entity_name, fmt):
+    if entity_type not in ENTITY_TYPES or fmt not in FORMATS:
+        abort(404)
+
+    export = find_export(entity_type, entity_name, fmt)
+    if export is None:
+        abort(404)
+
+    path, etag = export
+    return send_file(path, mimetype=FORMATS[fmt], etag=etag, conditional=True, max_age=300,
+                     download_name=f"{entity_name}.{fmt}")
+
 ############################################################# LECTURER SIDE ####################################
 
 @app.route('/lecturertimetable', methods=['GET'])
@@ -421,7 +607,7 @@ def lecturer_timetable():
         return redirect(url_for('login'))
     
     lecturer_name = session.get('lecturer_name')  # Get lecturer's name from session
-    timetable = list(timetable_collection.find({"lecturer": lecturer_name}))  # Fetch timetable for the lecturer
+    timetable = list(timetable_collection.find(active_query({"lecturer": lecturer_name})))  # Fetch timetable for the lecturer
 
     # Print for debugging
     print("Timetable Data:", timetable)
@@ -429,16 +615,8 @@ def lecturer_timetable():
     return render_template("lecturer_timetable.html", timetable=timetable)
 
 def generate_time_slots():
-    """Generate hourly time slots from 08:00 to 18:00."""
-    slots = []
-    start = datetime.strptime("08:00", "%H:%M")
-    end = datetime.strptime("18:00", "%H:%M")
-
-    while start < end:
-        next_slot = start + timedelta(hours=1)
-        slots.append(f"{start.strftime('%H:%M')} - {next_slot.strftime('%H:%M')}")
-        start = next_slot
-    return slots
+    """Generate hourly time slots from 8:00 to 18:00."""
+    return [format_time(start_slot) for start_slot in range(SLOTS_PER_DAY)]
 
 @app.route('/lecturercourse')
 def lecturer_courses():
@@ -463,19 +641,17 @@ def check_availability():
     venue = request.args.get('venue')
 
     # Fetch all timetable entries for the selected venue
-    booked_slots = timetable_collection.find({"room": venue})
-    
-    if not booked_slots:
-        print(f"No bookings found for room: {venue}")
+    booked_slots = timetable_collection.find(
+        active_query({"room": venue}), {"day_index": 1, "start_slot": 1, "duration": 1}
+    )
 
     # Initialize availability dictionary
-    availability = {day: [] for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]}
+    availability = {day: [] for day in DAYS}
 
-    # Populate the availability dictionary
+    # Populate the availability dictionary with every booked hour
     for slot in booked_slots:
-        day = slot['day']
-        time = slot['time']
-        availability[day].append(time)
+        for day_idx, start_slot in covered_slots(slot):
+            availability[DAYS[day_idx]].append(format_time(start_slot))
 
     return jsonify(availability)
 
@@ -507,15 +683,25 @@ def request_replacement():
             'status': 'pending',
             'submitted_at': datetime.now()
         }
-        mongo.db.requests.insert_one(request_data)
+        if timeslots:
+            try:
+                day_idx, start_slot, duration = parse_timeslot(timeslots)
+                valid = slot_in_day(start_slot, duration)
+            except ValueError:
+                valid = False
+            if not valid:
+                flash(f'Invalid time slot: {timeslots}', 'danger')
+                return redirect(url_for('request_replacement'))
+            request_data['requested_slot'] = {'day_index': day_idx, 'start_slot': start_slot, 'duration': duration}
+        request_collection.insert_one(request_data)
 
         flash('Replacement request submitted successfully!', 'success')
         return redirect('/lecturer')
 
-    rooms = list(mongo.db.rooms.find())  # Fetch available rooms
+    rooms = list(rooms_collection.find())  # Fetch available rooms
 
     lecturer = session.get('lecturer_name')
-    slots = timetable_collection.find({"lecturer": lecturer})  # Fetch slots to replace
+    slots = timetable_collection.find(active_query({"lecturer": lecturer}))  # Fetch slots to replace
     
     return render_template('lecturer_request.html', rooms=rooms, slots=slots)
 
@@ -1,17 +1,10 @@
 from flask import Flask, render_template, request, redirect, url_for, flash
-from flask_pymongo import PyMongo
 from werkzeug.security import generate_password_hash
+from database import users_collection
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
 
-# MongoDB configuration
-app.config["MONGO_URI"] = "mongodb://localhost:27017/college_timetable"
-mongo = PyMongo(app)
-
-# Collection for storing users
-users_collection = mongo.db.users
-
 # Route to the registration page
 @app.route('/', methods=['GET', 'POST'])
 def register():
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import json
+import os
+
+from pymongo import UpdateOne
+from werkzeug.security import generate_password_hash
+
+from database import courses_collection, users_collection, rooms_collection
+from slots import AVAILABILITY_DAYS, SLOTS_PER_DAY, parse_time
+
+BATCH_SIZE = 500
+ROLES = ['admin', 'lecturer', 'student']
+
+
+# Stream rows from a CSV, JSON Lines or JSON array file as (row_number, row, error); a JSON Lines
+# line that does not parse is yielded with its error so the rest of the file is still imported
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line), None
+                except ValueError as e:
+                    yield line_no, None, f"invalid JSON: {e}"
+    elif fmt == 'json':
+        # A JSON array has to be parsed whole; use JSON Lines for very large files
+        rows = json.load(stream)
+        if not isinstance(rows, list):
+            raise ValueError("a JSON file must contain an array of rows")
+        for row_no, row in enumerate(rows, start=1):
+            yield row_no, row, None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    return 'jsonl' if extension == 'ndjson' else extension
+
+
+# Existing rooms, lecturers and departments, loaded once per import for in-memory validation
+def load_lookups():
+    rooms = list(rooms_collection.find({}, {'capacity': 1, 'room_type': 1, '_id': 0}))
+    return {
+        'lecturers': set(users_collection.distinct('username', {'role': 'lecturer'})),
+        'departments': set(users_collection.distinct('department')) | set(courses_collection.distinct('department')),
+        'max_capacity': max((room['capacity'] for room in rooms), default=0),
+        'max_lab_capacity': max((room['capacity'] for room in rooms if room.get('room_type') == 'lab'), default=0),
+        'seen': set(),
+    }
+
+
+def text(row, field):
+    value = row.get(field)
+    return str(value).strip() if value is not None else ''
+
+
+def integer(row, field, errors, default=None):
+    value = text(row, field)
+    if not value:
+        if default is None:
+            errors.append(f"{field} is required")
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        errors.append(f"{field} must be a whole number, got {value!r}")
+        return default
+
+
+def require(row, fields, errors):
+    for field in fields:
+        if not text(row, field):
+            errors.append(f"{field} is required")
+
+
+# Availability ranges for one day, as the registration form stores them: a list of 'HH:MM-HH:MM'
+# strings, empty when the lecturer is unavailable. A cell may hold several ranges separated by ';'.
+def availability_ranges(row, day, errors):
+    value = row.get(day)
+    if isinstance(value, list):
+        ranges = [str(time_range).strip() for time_range in value]
+    else:
+        ranges = text(row, day).replace(',', ';').split(';')
+    ranges = [time_range for time_range in ranges if time_range]
+
+    for time_range in ranges:
+        try:
+            start_slot, duration = parse_time(time_range)
+        except ValueError:
+            errors.append(f"{day}: {time_range!r} is not a time range such as 08:00-10:00")
+            continue
+        if start_slot < 0 or duration <= 0 or start_slot + duration > SLOTS_PER_DAY:
+            errors.append(f"{day}: {time_range!r} is outside the teaching day")
+    return ranges
+
+
+def check_duplicate(key, lookups, errors):
+    if key in lookups['seen']:
+        errors.append(f"duplicate of an earlier row ({key})")
+    lookups['seen'].add(key)
+
+
+# Each validator returns (key filter, document, errors) for one row
+def validate_course(row, lookups):
+    errors = []
+    require(row, ['course_code', 'course_name', 'lecturer', 'department'], errors)
+    credit_hours = integer(row, 'credit_hours', errors)
+    lab_hours = integer(row, 'lab_hours', errors, default=0)
+    student_count = integer(row, 'student_count', errors)
+
+    lecturer = text(row, 'lecturer')
+    department = text(row, 'department')
+    if lecturer and lecturer not in lookups['lecturers']:
+        errors.append(f"unknown lecturer {lecturer!r}")
+    if department and department not in lookups['departments']:
+        errors.append(f"unknown department {department!r}")
+    if student_count is not None and student_count > lookups['max_capacity']:
+        errors.append(f"no room can hold {student_count} students")
+    if lab_hours and student_count is not None and student_count > lookups['max_lab_capacity']:
+        errors.append(f"no lab can hold {student_count} students")
+
+    course_code = text(row, 'course_code')
+    check_duplicate(course_code, lookups, errors)
+    return {'course_code': course_code}, {
+        'course_code': course_code,
+        'course_name': text(row, 'course_name'),
+        'lecturer': lecturer,
+        'credit_hours': credit_hours,
+        'lab_hours': lab_hours,
+        'student_count': student_count,
+        'department': department
+    }, errors
+
+
+def validate_room(row, lookups):
+    errors = []
+    require(row, ['room_name', 'room_type'], errors)
+    capacity = integer(row, 'capacity', errors)
+    if capacity is not None and capacity <= 0:
+        errors.append("capacity must be positive")
+
+    room_name = text(row, 'room_name')
+    check_duplicate(room_name, lookups, errors)
+    return {'room_name': room_name}, {
+        'room_name': room_name,
+        'capacity': capacity,
+        'room_type': text(row, 'room_type'),
+    }, errors
+
+
+def validate_user(row, lookups):
+    errors = []
+    require(row, ['username', 'email', 'role', 'password'], errors)
+    role = text(row, 'role')
+    if role and role not in ROLES:
+        errors.append(f"role must be one of {', '.join(ROLES)}")
+    if role in ('lecturer', 'student'):
+        require(row, ['department'], errors)
+
+    # Availability only for lecturers, one column per day as in the registration form
+    availability = {
+        day: availability_ranges(row, day, errors) for day in AVAILABILITY_DAYS
+    } if role == 'lecturer' else None
+
+    username = text(row, 'username')
+    check_duplicate(username, lookups, errors)
+    if errors:
+        return {'username': username}, None, errors
+
+    return {'username': username}, {
+        'username': username,
+        'email': text(row, 'email'),
+        'role': role,
+        'password': generate_password_hash(text(row, 'password')),
+        'department': text(row, 'department'),
+        'availability': availability
+    }, errors
+
+
+IMPORTERS = {
+    'courses': (courses_collection, validate_course),
+    'rooms': (rooms_collection, validate_room),
+    'users': (users_collection, validate_user),
+}
+
+
+def flush(collection, operations, report):
+    if operations:
+        result = collection.bulk_write(operations, ordered=False)
+        report['inserted'] += result.upserted_count
+        report['updated'] += result.modified_count
+        operations.clear()
+
+
+# Validate and upsert every row of a file, writing in batches; invalid rows are reported, not written
+def import_rows(kind, stream, fmt, batch_size=BATCH_SIZE):
+    collection, validate = IMPORTERS[kind]
+    lookups = load_lookups()
+    report = {'kind': kind, 'rows': 0, 'inserted': 0, 'updated': 0, 'errors': []}
+    operations = []
+
+    for row_no, row, error in read_rows(stream, fmt):
+        report['rows'] += 1
+        if error is None and not isinstance(row, dict):
+            error = "row must be a JSON object"
+        if error:
+            report['errors'].append({'row': row_no, 'errors': [error]})
+            continue
+
+        key, document, errors = validate(row, lookups)
+        if errors:
+            report['errors'].append({'row': row_no, 'errors': errors})
+            continue
+
+        operations.append(UpdateOne(key, {'$set': document}, upsert=True))
+        if len(operations) >= batch_size:
+            flush(collection, operations, report)
+
+    flush(collection, operations, report)
+    return report
+
+
+def import_file(kind, path, batch_size=BATCH_SIZE):
+    with open(path, newline='', encoding='utf-8') as stream:
+        return import_rows(kind, stream, detect_format(path), batch_size)
+
+
+def write_error_report(report, path):
+    with open(path, 'w', newline='', encoding='utf-8') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(['row', 'error'])
+        for failure in report['errors']:
+            for error in failure['errors']:
+                writer.writerow([failure['row'], error])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk import courses, rooms or users from CSV/JSON")
+    parser.add_argument('kind', choices=sorted(IMPORTERS))
+    parser.add_argument('path', help="CSV, JSON Lines (.jsonl/.ndjson) or JSON array file")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--report', help="Write the per-row error report to this CSV file")
+    args = parser.parse_args()
+
+    report = import_file(args.kind, args.path, args.batch_size)
+    print(f"{report['rows']} rows: {report['inserted']} inserted, {report['updated']} updated, "
+          f"{len(report['errors'])} rejected")
+    if args.report:
+        write_error_report(report, args.report)
+    else:
+        for failure in report['errors']:
+            print(f"  row {failure['row']}: {'; '.join(failure['errors'])}")
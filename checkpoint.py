@@ -0,0 +1,106 @@
+import contextlib
+import hashlib
+import os
+import random
+import threading
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+# Identify the problem a checkpoint belongs to, so a run is never resumed against different data
+def problem_key(courses_data, room_data, num_genes):
+    digest = hashlib.sha1()
+    for doc in list(courses_data) + list(room_data):
+        digest.update(str(doc.get('_id', doc.get('course_code', doc.get('room_name')))).encode())
+    digest.update(str(num_genes).encode())
+    return digest.hexdigest()
+
+
+# Checkpoint files in use by runs in this process
+_claimed = set()
+_claimed_lock = threading.Lock()
+
+
+# Checkpoint file for one problem, so runs of different problems never share a checkpoint. Yields
+# None (run without checkpointing) if another run in this process is already using that file,
+# rather than letting two runs overwrite and then delete each other's checkpoint.
+@contextlib.contextmanager
+def claimed_checkpoint(path, key):
+    if not path:
+        yield None
+        return
+    base, extension = os.path.splitext(path)
+    path = f"{base}-{key[:16]}{extension or '.npz'}"
+    with _claimed_lock:
+        if path in _claimed:
+            print(f"Another run is already checkpointing this problem to {path}; not checkpointing this one")
+            path = None
+        else:
+            _claimed.add(path)
+    try:
+        yield path
+    finally:
+        if path:
+            with _claimed_lock:
+                _claimed.discard(path)
+
+
+# Write the GA state to a compressed .npz, replacing any previous checkpoint atomically
+def save_checkpoint(path, key, population, best_solution, best_fitness, generations_completed):
+    _, np_keys, np_pos, np_has_gauss, np_cached_gaussian = np.random.get_state()
+    py_version, py_state, py_gauss_next = random.getstate()
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            version=CHECKPOINT_VERSION,
+            problem_key=key,
+            population=population,
+            best_solution=best_solution,
+            best_fitness=best_fitness,
+            generations_completed=generations_completed,
+            np_keys=np_keys,
+            np_pos=np_pos,
+            np_has_gauss=np_has_gauss,
+            np_cached_gaussian=np_cached_gaussian,
+            py_version=py_version,
+            py_state=np.array(py_state, dtype=np.uint64),
+            py_gauss_next=np.nan if py_gauss_next is None else py_gauss_next,
+        )
+    os.replace(tmp_path, path)
+
+
+# Load a checkpoint written for the same problem, or None if there is no usable one
+def load_checkpoint(path, key):
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as data:
+        if int(data['version']) != CHECKPOINT_VERSION or str(data['problem_key']) != key:
+            print(f"Ignoring checkpoint {path}: it was written for a different problem or format")
+            return None
+
+        py_gauss_next = float(data['py_gauss_next'])
+        return {
+            'population': data['population'],
+            'best_solution': data['best_solution'],
+            'best_fitness': float(data['best_fitness']),
+            'generations_completed': int(data['generations_completed']),
+            'np_state': ('MT19937', data['np_keys'], int(data['np_pos']),
+                         int(data['np_has_gauss']), float(data['np_cached_gaussian'])),
+            'py_state': (int(data['py_version']), tuple(int(v) for v in data['py_state']),
+                         None if np.isnan(py_gauss_next) else py_gauss_next),
+        }
+
+
+# Restore the NumPy and Python RNGs so a resumed run continues the same random stream
+def restore_rng_state(checkpoint):
+    np.random.set_state(checkpoint['np_state'])
+    random.setstate(checkpoint['py_state'])
@@ -1,13 +1,108 @@
-from pymongo import MongoClient
+import os
+import threading
+
+from pymongo import DESCENDING, MongoClient
+
+from slots import ensure_slot_indexes
+
+# MongoDB connection settings, overridable through the environment
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/college_timetable')
+DEFAULT_DATABASE = 'college_timetable'
+
+
+def client_options():
+    options = {
+        'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+        'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+        'connectTimeoutMS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        'serverSelectionTimeoutMS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        'waitQueueTimeoutMS': int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+        'readPreference': os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+        'connect': False,  # Connect on the first operation, not when the client is created
+    }
+    if os.environ.get('MONGO_SOCKET_TIMEOUT_MS'):
+        options['socketTimeoutMS'] = int(os.environ['MONGO_SOCKET_TIMEOUT_MS'])
+    return options
+
+
+# One client (and so one connection pool) per process, shared by the web routes and the solvers.
+# It is created on first use, and recreated in a forked child since MongoClient is not fork-safe.
+_client = None
+_client_pid = None
+_indexes_ready = False
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MongoClient(MONGO_URI, **client_options())
+                _client_pid = os.getpid()
+    return _client
+
+
+# Use an already-created client (e.g. an in-process stand-in for load tests) instead of MongoClient
+def set_client(client):
+    global _client, _client_pid, _indexes_ready
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+        _indexes_ready = False
+
+
+def get_db():
+    return get_client().get_default_database(DEFAULT_DATABASE)
+
+
+def _reset_after_fork():
+    global _client, _client_pid, _indexes_ready, _lock
+    # The parent's sockets must not be used (or closed) from the child
+    _client = None
+    _client_pid = None
+    _indexes_ready = False
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LazyCollection:
+    """Collection handle that resolves against the shared client on first use."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
 
-# MongoDB connection setup
-client = MongoClient('mongodb://localhost:27017/')
-db = client['college_timetable']
 
 # MongoDB collections
-courses_collection = db['courses']
-users_collection = db['users']
-rooms_collection = db['rooms']
-timetable_collection = db['timetables']
+courses_collection = LazyCollection('courses')
+users_collection = LazyCollection('users')
+rooms_collection = LazyCollection('rooms')
+timetable_collection = LazyCollection('timetables')
+request_collection = LazyCollection('requests')
+versions_collection = LazyCollection('timetable_versions')
+
+
+# Create the indexes used by the read paths, once per process
+def ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    # Pending requests are listed and batch-approved by status in submission order
+    request_collection.create_index([('status', 1), ('submitted_at', 1)])
+    ensure_slot_indexes(timetable_collection)
+    # The active version is looked up by status, newest publication first
+    versions_collection.create_index([('status', 1), ('published_at', DESCENDING)])
+    _indexes_ready = True
+
 
-__all__ = ['courses_collection', 'users_collection', 'rooms_collection', 'timetable_collection']
+__all__ = ['courses_collection', 'users_collection', 'rooms_collection', 'timetable_collection', 'request_collection',
+           'versions_collection']
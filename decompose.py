@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from algorithm import DAY_SLOTS, NUM_GENERATIONS, fetch_data, solution_to_entries, solve_problem
+from slots import DAYS, slot_fields
+from snapshot import resolve_snapshot
+
+# Department decomposition: every department's courses (with their lecturers) are solved as an
+# independent sub-problem in its own process over the shared rooms, and the sub-timetables are
+# then merged, moving any session that clashes with another department to a free room or time.
+
+
+# Split the problem into {department: (courses, lecturers)}; rooms are shared by every department
+def split_by_department(courses_data, lecturer_data):
+    lecturers_by_name = {lecturer['username']: lecturer for lecturer in lecturer_data}
+    departments = {}
+    for course in courses_data:
+        department = course.get('department') or 'Unknown Department'
+        departments.setdefault(department, []).append(course)
+
+    return {
+        department: (courses, [lecturers_by_name[name] for name in sorted({c['lecturer'] for c in courses})
+                               if name in lecturers_by_name])
+        for department, courses in departments.items()
+    }
+
+
+# Worker process entry point: solve one department and return its timetable entries
+def solve_department(department, courses_data, lecturer_data, room_data, num_generations, adaptive=False):
+    solution, fitness = solve_problem(courses_data, lecturer_data, room_data, num_generations=num_generations,
+                                      adaptive=adaptive)
+    entries = solution_to_entries(solution, courses_data, room_data, lecturer_data)
+    for entry in entries:
+        entry['department'] = department
+    return department, float(fitness), entries
+
+
+# Group hourly entries into sessions: consecutive slots of the same course on the same day
+def group_sessions(entries):
+    sessions = []
+    for entry in sorted(entries, key=lambda e: (e['course'], e['day_index'], e['start_slot'])):
+        last = sessions[-1] if sessions else None
+        if (last and last['course'] == entry['course'] and last['day_index'] == entry['day_index']
+                and last['start_slot'] + last['duration'] == entry['start_slot']):
+            last['duration'] += 1
+            last['rooms'].append(entry['room'])
+        else:
+            sessions.append({
+                'course': entry['course'],
+                'lecturer': entry['lecturer'],
+                'department': entry['department'],
+                'day_index': entry['day_index'],
+                'start_slot': entry['start_slot'],
+                'duration': 1,
+                'rooms': [entry['room']],
+            })
+    return sessions
+
+
+# Merge department timetables, repairing room and lecturer clashes between departments
+def merge_timetables(department_entries, courses_data, room_data):
+    student_counts = {course['course_name']: course.get('student_count', 0) for course in courses_data}
+    room_capacity = {room['room_name']: room.get('capacity', 0) for room in room_data}
+    room_busy = set()      # (room, day_index, slot)
+    lecturer_busy = set()  # (lecturer, day_index, slot)
+
+    def hours(day_idx, start_slot, duration):
+        return [(day_idx, slot) for slot in range(start_slot, start_slot + duration)]
+
+    def free_room(session, day_idx, start_slot):
+        needed = student_counts.get(session['course'], 0)
+        for room in sorted(room_capacity, key=room_capacity.get):
+            if room_capacity[room] >= needed and all(
+                    (room,) + hour not in room_busy for hour in hours(day_idx, start_slot, session['duration'])):
+                return room
+        return None
+
+    def lecturer_free(session, day_idx, start_slot):
+        return all((session['lecturer'],) + hour not in lecturer_busy
+                   for hour in hours(day_idx, start_slot, session['duration']))
+
+    merged = []
+    repaired = 0
+    unplaced = []
+
+    # Larger departments first, so the smaller ones are the ones that move
+    for department in sorted(department_entries, key=lambda d: len(department_entries[d]), reverse=True):
+        for session in group_sessions(department_entries[department]):
+            day_idx, start_slot, duration = session['day_index'], session['start_slot'], session['duration']
+            placements = [(room, hour) for room, hour in zip(session['rooms'], hours(day_idx, start_slot, duration))]
+
+            if not lecturer_free(session, day_idx, start_slot) or any(
+                    (room,) + hour in room_busy for room, hour in placements):
+                # Keep the time if a single room is free for the whole session, otherwise search for another time
+                candidates = [(day_idx, start_slot)] + [
+                    (d, s) for d in range(len(DAYS)) for s in range(DAY_SLOTS - duration + 1) if (d, s) != (day_idx, start_slot)
+                ]
+                placements = None
+                for d, s in candidates:
+                    room = free_room(session, d, s) if lecturer_free(session, d, s) else None
+                    if room:
+                        day_idx, start_slot = d, s
+                        placements = [(room, hour) for hour in hours(d, s, duration)]
+                        repaired += 1
+                        break
+                if placements is None:
+                    unplaced.append({'course': session['course'], 'department': department})
+                    continue
+
+            for room, hour in placements:
+                room_busy.add((room,) + hour)
+                lecturer_busy.add((session['lecturer'],) + hour)
+                entry = {
+                    "course": session['course'],
+                    "lecturer": session['lecturer'],
+                    "department": department,
+                    "room": room,
+                }
+                entry.update(slot_fields(*hour))
+                merged.append(entry)
+
+    return merged, repaired, unplaced
+
+
+# Solve every department in parallel and merge the results into one timetable
+def run_decomposed(snapshot=None, max_workers=None, num_generations=NUM_GENERATIONS, adaptive=False):
+    snapshot = resolve_snapshot(snapshot)
+    courses_data, lecturer_data, room_data = snapshot.problem() if snapshot else fetch_data()
+    sub_problems = split_by_department(courses_data, lecturer_data)
+
+    department_entries = {}
+    fitness = {}
+    # Spawned, not forked: the web process has request, pymongo and event threads, and forking
+    # it can leave a child blocked on a lock one of them held
+    workers = max_workers or min(len(sub_problems), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(solve_department, department, courses, lecturers, room_data, num_generations, adaptive)
+            for department, (courses, lecturers) in sub_problems.items()
+        ]
+        for future in futures:
+            department, department_fitness, entries = future.result()
+            department_entries[department] = entries
+            fitness[department] = department_fitness
+
+    merged, repaired, unplaced = merge_timetables(department_entries, courses_data, room_data)
+    print(f"Merged {len(sub_problems)} departments: {repaired} sessions moved, {len(unplaced)} unplaced")
+    return merged, {'fitness': fitness, 'repaired': repaired, 'unplaced': unplaced}
@@ -0,0 +1,297 @@
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from werkzeug.utils import secure_filename
+
+from database import timetable_collection
+from slots import FIRST_HOUR, format_time
+
+# Per-lecturer, per-room and per-department timetable exports, rendered once when a timetable
+# is published and served as static files with ETags, so polling calendar clients cost a file
+# read instead of a database query. Layout: <EXPORT_DIR>/<version>/<entity>/<name>.<format>,
+# with <EXPORT_DIR>/CURRENT naming the published version. A file's content (and so its ETag)
+# only changes when that entity's sessions change, so unchanged calendars keep answering 304.
+# Absolute, since send_file resolves relative paths against the app directory, not the working directory
+EXPORT_DIR = os.path.abspath(os.environ.get('TIMETABLE_EXPORT_DIR', 'exports'))
+TERM_WEEKS = int(os.environ.get('TIMETABLE_TERM_WEEKS', 14))
+KEEP_VERSIONS = 2  # Published version plus the one before it, for clients mid-download
+
+ENTITY_TYPES = ['lecturer', 'room', 'department']
+FORMATS = {'ics': 'text/calendar', 'csv': 'text/csv', 'json': 'application/json'}
+ENTRY_PROJECTION = {
+    '_id': 0, 'course': 1, 'lecturer': 1, 'room': 1, 'department': 1,
+    'day_index': 1, 'start_slot': 1, 'duration': 1, 'day': 1, 'time': 1
+}
+CSV_FIELDS = ['day', 'time', 'course', 'lecturer', 'room', 'department']
+JSON_FIELDS = ['day_index', 'start_slot', 'duration', 'course', 'lecturer', 'room', 'department']
+
+
+# File name for an entity; the hash keeps names that sanitise to the same string apart
+def export_filename(name, fmt):
+    digest = hashlib.sha1(name.encode()).hexdigest()[:8]
+    return f"{secure_filename(name) or 'entity'}-{digest}.{fmt}"
+
+
+# First Monday of the term, from TIMETABLE_TERM_START (YYYY-MM-DD) or the current week
+def term_start():
+    if os.environ.get('TIMETABLE_TERM_START'):
+        start = datetime.date.fromisoformat(os.environ['TIMETABLE_TERM_START'])
+    else:
+        start = datetime.date.today()
+    return start - datetime.timedelta(days=start.weekday())
+
+
+def render_csv(entries):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(entries)
+    return output.getvalue()
+
+
+def render_json(entries):
+    return json.dumps({
+        'fields': JSON_FIELDS,
+        'sessions': [[entry.get(field) for field in JSON_FIELDS] for entry in entries],
+    }, separators=(',', ':'))
+
+
+def ics_text(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+# Fold content lines longer than 75 octets, as RFC 5545 requires
+def ics_fold(line):
+    folded = []
+    while len(line.encode()) > 75:
+        cut = 75
+        while len(line[:cut].encode()) > 75:
+            cut -= 1
+        folded.append(line[:cut])
+        line = ' ' + line[cut:]
+    folded.append(line)
+    return '\r\n'.join(folded)
+
+
+def render_ics(entries, title, stamp, start_date):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//TimetableSchedule//Timetable Export//EN',
+        'CALSCALE:GREGORIAN',
+        f"X-WR-CALNAME:{ics_text(title)}",
+    ]
+    for entry in entries:
+        day = start_date + datetime.timedelta(days=entry['day_index'])
+        start = datetime.datetime.combine(day, datetime.time(FIRST_HOUR + entry['start_slot']))
+        end = start + datetime.timedelta(hours=entry.get('duration', 1))
+        # Stable across publishes, so calendar clients update events in place
+        uid = hashlib.sha1(
+            f"{entry['course']}|{entry['room']}|{entry['day_index']}|{entry['start_slot']}".encode()
+        ).hexdigest()
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:{uid}@timetableschedule",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+            f"RRULE:FREQ=WEEKLY;COUNT={TERM_WEEKS}",
+            f"SUMMARY:{ics_text(entry['course'])}",
+            f"LOCATION:{ics_text(entry['room'])}",
+            f"DESCRIPTION:{ics_text('Lecturer: ' + str(entry['lecturer']))}",
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(ics_fold(line) for line in lines) + '\r\n'
+
+
+# Digest of an entity's sessions, to tell whether its exports changed since the last publish
+def sessions_digest(entries, start_date):
+    data = json.dumps([[entry.get(field) for field in JSON_FIELDS] for entry in entries] + [start_date.isoformat()])
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def read_current():
+    try:
+        with open(os.path.join(EXPORT_DIR, 'CURRENT')) as f:
+            version = f.read().strip()
+        with open(os.path.join(EXPORT_DIR, version, 'manifest.json')) as f:
+            return version, json.load(f)
+    except FileNotFoundError:
+        return None, {}
+
+
+# Exclusive lock on an open file, shared by every process publishing to EXPORT_DIR
+def lock_file(f):
+    if fcntl:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after ~10 seconds of retries
+            return
+        except OSError:
+            time.sleep(0.1)
+
+
+def unlock_file(f):
+    if fcntl:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Render the exports for a timetable version and make it the published one. With entities
+# ({'lecturer': [...], 'room': [...], 'department': [...]}) only those are re-rendered and every
+# other export is carried forward from the current version. Publishes are serialised with a
+# lock file, so the last one to run (the one that read the newest timetable) is left in CURRENT.
+def publish_exports(version, query=None, entities=None):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    with open(os.path.join(EXPORT_DIR, '.lock'), 'w') as lock:
+        lock_file(lock)
+        try:
+            return _publish_exports(version, query, entities)
+        finally:
+            unlock_file(lock)
+
+
+# Hard-link an unchanged export into the new version, copying where links are not supported
+def carry_forward(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _publish_exports(version, query, entities):
+    start_date = term_start()
+    previous_version, previous = read_current()
+    # A full render when there is nothing to carry forward, or the term week moved every DTSTART
+    incremental = (entities is not None and previous_version is not None
+                   and previous.get('start_date') == start_date.isoformat())
+    if incremental:
+        entities = {entity_type: set(entities.get(entity_type) or ()) for entity_type in ENTITY_TYPES}
+
+    query = dict(query or {}, day_index={'$exists': True})
+    if incremental:
+        query['$or'] = [{entity_type: {'$in': sorted(names)}} for entity_type, names in entities.items() if names]
+    if incremental and not query['$or']:
+        entries = []
+    else:
+        entries = list(timetable_collection.find(
+            query, ENTRY_PROJECTION
+        ).sort([('day_index', 1), ('start_slot', 1)]))
+    for entry in entries:
+        entry.setdefault('duration', 1)
+        entry.setdefault('time', format_time(entry['start_slot'], entry['duration']))
+
+    grouped = {entity_type: {} for entity_type in ENTITY_TYPES}
+    for entry in entries:
+        for entity_type in ENTITY_TYPES:
+            name = entry.get(entity_type)
+            if name and (not incremental or name in entities[entity_type]):
+                grouped[entity_type].setdefault(name, []).append(entry)
+
+    version_dir = os.path.join(EXPORT_DIR, version)
+    staging_dir = version_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    manifest = {'start_date': start_date.isoformat()}
+
+    for entity_type, by_name in grouped.items():
+        os.makedirs(os.path.join(staging_dir, entity_type), exist_ok=True)
+        manifest[entity_type] = {}
+        for name, entity_entries in by_name.items():
+            # DTSTAMP only moves when this entity's sessions change
+            digest = sessions_digest(entity_entries, start_date)
+            earlier = previous.get(entity_type, {}).get(name, {})
+            if earlier.get('sessions') == digest and earlier.get('stamp'):
+                stamp = earlier['stamp']
+            else:
+                stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+            rendered = {
+                'ics': render_ics(entity_entries, f"{name} timetable", stamp, start_date),
+                'csv': render_csv(entity_entries),
+                'json': render_json(entity_entries),
+            }
+            manifest[entity_type][name] = {'sessions': digest, 'stamp': stamp}
+            for fmt, content in rendered.items():
+                data = content.encode()
+                filename = export_filename(name, fmt)
+                with open(os.path.join(staging_dir, entity_type, filename), 'wb') as f:
+                    f.write(data)
+                manifest[entity_type][name][fmt] = {'file': filename, 'etag': hashlib.sha1(data).hexdigest()}
+
+        if incremental:
+            for name, export in previous.get(entity_type, {}).items():
+                if name in entities[entity_type]:
+                    continue  # Re-rendered above, or no longer has any sessions
+                for fmt in FORMATS:
+                    filename = export[fmt]['file']
+                    carry_forward(os.path.join(EXPORT_DIR, previous_version, entity_type, filename),
+                                  os.path.join(staging_dir, entity_type, filename))
+                manifest[entity_type][name] = export
+
+    with open(os.path.join(staging_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(staging_dir, version_dir)
+    pointer = os.path.join(EXPORT_DIR, 'CURRENT')
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(version)
+    os.replace(pointer + '.tmp', pointer)
+
+    prune_exports(version)
+    return sum(len(rendered) for rendered in grouped.values())
+
+
+# Keep only the newest KEEP_VERSIONS export directories
+def prune_exports(current):
+    versions = sorted(
+        (name for name in os.listdir(EXPORT_DIR)
+         if os.path.isdir(os.path.join(EXPORT_DIR, name)) and not name.endswith('.tmp')),
+        key=lambda name: os.path.getmtime(os.path.join(EXPORT_DIR, name)),
+        reverse=True
+    )
+    for name in versions[KEEP_VERSIONS:]:
+        if name != current:
+            shutil.rmtree(os.path.join(EXPORT_DIR, name), ignore_errors=True)
+
+
+_manifest_cache = {'version': None, 'manifest': None}
+
+
+# (path, etag) of a published export, or None; the manifest is re-read only when CURRENT changes
+def find_export(entity_type, name, fmt):
+    try:
+        with open(os.path.join(EXPORT_DIR, 'CURRENT')) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+
+    if _manifest_cache['version'] != version:
+        try:
+            with open(os.path.join(EXPORT_DIR, version, 'manifest.json')) as f:
+                _manifest_cache['manifest'] = json.load(f)
+        except FileNotFoundError:
+            return None
+        _manifest_cache['version'] = version
+
+    export = _manifest_cache['manifest'].get(entity_type, {}).get(name, {}).get(fmt)
+    if not export:
+        return None
+    return os.path.join(EXPORT_DIR, version, entity_type, export['file']), export['etag']
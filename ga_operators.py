@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+
+# Block-aware crossover and mutation for run_genetic_algorithm's encoding (one gene per time
+# slot holding a course index or -1). Both operators move whole course sessions, so a 2-hour
+# course always stays in two consecutive slots of one day, and they prefer slots where the
+# lecturer is available and the session's room is large enough for the course. A session is
+# held in the room of its first slot (see session_room).
+
+
+# Session lengths a course is scheduled in, matching what fitness_func rewards:
+# 2-credit courses as one 2-hour block, everything else as 1-hour sessions
+def session_lengths(course):
+    return [2] if course['credit_hours'] == 2 else [1] * course['credit_hours']
+
+
+# Index into room_data of the room a gene is held in: the second hour of a 2-hour block stays in
+# the room of its first hour, every other gene uses the room of its own slot
+def session_room(solution, slot_idx, courses_data, room_count, day_slots):
+    course_idx = int(solution[slot_idx])
+    if (slot_idx % day_slots > 0 and int(solution[slot_idx - 1]) == course_idx
+            and courses_data[course_idx]['credit_hours'] == 2):
+        return (slot_idx - 1) % room_count
+    return slot_idx % room_count
+
+
+# Runs of consecutive genes holding course_idx within one day, as (start, length)
+def course_runs(solution, course_idx, day_slots):
+    runs = []
+    idx = 0
+    while idx < len(solution):
+        if int(solution[idx]) == course_idx:
+            start = idx
+            idx += 1
+            while idx < len(solution) and int(solution[idx]) == course_idx and idx % day_slots != 0:
+                idx += 1
+            runs.append((start, idx - start))
+        else:
+            idx += 1
+    return runs
+
+
+def block_operators(courses_data, room_data, lecturer_availability, day_slots):
+    # Slots where each course's lecturer is available
+    available = [set(lecturer_availability.get(course['lecturer'], [])) for course in courses_data]
+
+    # Whether the room a session starting at this slot is held in fits the course's students
+    def fits(course_idx, start):
+        return room_data[start % len(room_data)]['capacity'] >= courses_data[course_idx]['student_count']
+
+    def is_free(child, start, length):
+        return (start % day_slots + length <= day_slots
+                and all(int(child[i]) == -1 for i in range(start, start + length)))
+
+    # Put a block of course_idx at a random free position, preferring feasible ones
+    def place_block(child, course_idx, length):
+        free = [start for start in range(len(child) - length + 1) if is_free(child, start, length)]
+        if not free:
+            return False
+        feasible = [start for start in free if fits(course_idx, start)
+                    and all(slot in available[course_idx] for slot in range(start, start + length))]
+        start = random.choice(feasible or free)
+        child[start:start + length] = course_idx
+        return True
+
+    # Build each child course by course, inheriting every session of a course from one parent
+    def crossover(parents, offspring_size, ga_instance):
+        offspring = np.full(offspring_size, -1, dtype=parents.dtype)
+        for k in range(offspring_size[0]):
+            parent1 = parents[k % parents.shape[0]]
+            parent2 = parents[(k + 1) % parents.shape[0]]
+            if random.random() > ga_instance.crossover_probability:
+                offspring[k] = parent1
+                continue
+
+            child = offspring[k]
+            for course_idx in random.sample(range(len(courses_data)), len(courses_data)):
+                runs = course_runs(random.choice((parent1, parent2)), course_idx, day_slots)
+                for length in session_lengths(courses_data[course_idx]):
+                    run = next((r for r in runs if r[1] == length and is_free(child, r[0], length)), None)
+                    if run:
+                        runs.remove(run)
+                        child[run[0]:run[0] + length] = course_idx
+                    else:
+                        place_block(child, course_idx, length)
+        return offspring
+
+    # Move whole sessions to another free (preferably feasible) position
+    def mutation(offspring, ga_instance):
+        for child in offspring:
+            for course_idx in range(len(courses_data)):
+                for start, length in course_runs(child, course_idx, day_slots):
+                    if random.random() < ga_instance.mutation_probability:
+                        child[start:start + length] = -1
+                        if not place_block(child, course_idx, length):
+                            child[start:start + length] = course_idx
+        return offspring
+
+    return crossover, mutation
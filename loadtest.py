@@ -0,0 +1,222 @@
+import argparse
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.security import generate_password_hash
+
+import database
+from slots import DAYS, SLOTS_PER_DAY, slot_fields
+from versions import create_version, publish_version, save_version_entries
+
+# Load test for the timetable read endpoints. A scratch database (or an in-process mongomock
+# stand-in) is seeded with a campus-sized timetable, then concurrent sessions drive the routes
+# either in-process through Flask's test client or over HTTP against a running server.
+PASSWORD = 'loadtest'
+ROOM_TYPES = ['lecture', 'lecture', 'lecture', 'lab']
+
+
+def seed(departments, lecturers_per_department, rooms, courses_per_lecturer, occupancy, seed_value=0):
+    rng = random.Random(seed_value)
+    for name in ('users', 'rooms', 'courses', 'timetables', 'timetable_versions', 'requests'):
+        database.get_db()[name].drop()
+
+    password = generate_password_hash(PASSWORD)  # Hashed once; every seeded user shares it
+    department_names = [f"Department {d + 1}" for d in range(departments)]
+    room_docs = [{
+        'room_name': f"R{r + 1:03d}",
+        'capacity': rng.choice([30, 40, 60, 80, 120, 200]),
+        'room_type': rng.choice(ROOM_TYPES),
+    } for r in range(rooms)]
+
+    users = [{'username': 'admin', 'email': 'admin@example.com', 'role': 'admin', 'password': password,
+              'department': None, 'availability': None}]
+    courses = []
+    for department in department_names:
+        for l in range(lecturers_per_department):
+            username = f"{department.split()[-1]}-lecturer-{l + 1}"
+            users.append({'username': username, 'email': f"{username}@example.com", 'role': 'lecturer',
+                          'password': password, 'department': department,
+                          'availability': {day.lower(): '8:00-18:00' for day in DAYS}})
+            for c in range(courses_per_lecturer):
+                courses.append({'course_code': f"{username}-C{c + 1}", 'course_name': f"{username} course {c + 1}",
+                                'lecturer': username, 'credit_hours': rng.choice([1, 2, 3]), 'lab_hours': 0,
+                                'student_count': rng.choice([25, 40, 60, 100]), 'department': department})
+        users.append({'username': f"{department.split()[-1]}-student", 'email': 'student@example.com',
+                      'role': 'student', 'password': password, 'department': department, 'availability': None})
+
+    # Fill each room's week to the requested occupancy, without double-booking lecturers
+    entries = []
+    lecturer_busy = set()
+    for room in room_docs:
+        for day_idx in range(len(DAYS)):
+            for start_slot in range(SLOTS_PER_DAY):
+                if rng.random() > occupancy:
+                    continue
+                course = rng.choice(courses)
+                if (course['lecturer'], day_idx, start_slot) in lecturer_busy:
+                    continue
+                lecturer_busy.add((course['lecturer'], day_idx, start_slot))
+                entry = {'course': course['course_name'], 'lecturer': course['lecturer'],
+                         'department': course['department'], 'room': room['room_name']}
+                entry.update(slot_fields(day_idx, start_slot))
+                entries.append(entry)
+
+    database.users_collection.insert_many(users)
+    database.rooms_collection.insert_many(room_docs)
+    database.courses_collection.insert_many(courses)
+    # Seeded as the published version, since every read path only queries that version
+    version_id = create_version('loadtest')
+    save_version_entries(version_id, entries)
+    publish_version(version_id)
+    database.ensure_indexes()
+    print(f"Seeded {len(users)} users, {len(room_docs)} rooms, {len(courses)} courses and {len(entries)} timetable entries")
+    return {
+        'students': [u for u in users if u['role'] == 'student'],
+        'lecturers': [u for u in users if u['role'] == 'lecturer'],
+        'rooms': [r['room_name'] for r in room_docs],
+        'departments': department_names,
+    }
+
+
+# (endpoint name, role, path) for one request, chosen from the seeded data
+def pick_request(rng, data):
+    room = rng.choice(data['rooms'])
+    lecturer = rng.choice(data['lecturers'])['username']
+    return rng.choice([
+        ('/student', 'student', '/student'),
+        ('/lecturertimetable', 'lecturer', '/lecturertimetable'),
+        ('/get_timetable/lecturer', 'admin', f"/get_timetable/lecturer/{urllib.parse.quote(lecturer)}"),
+        ('/get_timetable/room', 'admin', f"/get_timetable/room/{room}"),
+        ('/get_timetable/department', 'admin',
+         f"/get_timetable/department/{urllib.parse.quote(rng.choice(data['departments']))}"),
+        ('/check_availability', 'lecturer', f"/check_availability?venue={room}"),
+        ('/roomstats', 'admin', '/roomstats'),
+    ])
+
+
+class InProcessSession:
+    """A logged-in Flask test client session."""
+
+    def __init__(self, app, user):
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = str(user.get('_id', user['username']))
+            session['username'] = user['username']
+            session['role'] = user['role']
+            if user['role'] == 'lecturer':
+                session['lecturer_name'] = user['username']
+            if user['role'] == 'student':
+                session['student_name'] = user['username']
+                session['department'] = user['department']
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+
+class HttpSession:
+    """A cookie-holding HTTP session logged in through the login form of a running server."""
+
+    def __init__(self, base_url, user):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        form = urllib.parse.urlencode({'username': user['username'], 'password': PASSWORD}).encode()
+        self.opener.open(self.base_url + '/', form).read()
+
+    def get(self, path):
+        try:
+            with self.opener.open(self.base_url + path) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def run_load(make_session, data, users, duration, seed_value=0):
+    results = {}  # endpoint -> list of (latency_seconds, ok)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_idx):
+        rng = random.Random(seed_value + worker_idx)
+        sessions = {
+            'student': make_session(rng.choice(data['students'])),
+            'lecturer': make_session(rng.choice(data['lecturers'])),
+            'admin': make_session({'username': 'admin', 'role': 'admin'}),
+        }
+        samples = {}
+        while time.perf_counter() < deadline:
+            endpoint, role, path = pick_request(rng, data)
+            started = time.perf_counter()
+            status = sessions[role].get(path)
+            samples.setdefault(endpoint, []).append((time.perf_counter() - started, status == 200))
+        with lock:
+            for endpoint, endpoint_samples in samples.items():
+                results.setdefault(endpoint, []).extend(endpoint_samples)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def report(results, elapsed):
+    print(f"{'endpoint':<28}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    total = 0
+    for endpoint in sorted(results):
+        samples = results[endpoint]
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        total += len(samples)
+        print(f"{endpoint:<28}{len(samples):>10}{errors:>8}{len(samples) / elapsed:>10.1f}"
+              f"{percentile(latencies, 0.50) * 1000:>10.1f}{percentile(latencies, 0.95) * 1000:>10.1f}"
+              f"{percentile(latencies, 0.99) * 1000:>10.1f}")
+    print(f"Total: {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the timetable read endpoints")
+    parser.add_argument('--users', type=int, default=50, help="Concurrent sessions")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+    parser.add_argument('--base-url', help="Drive a running server over HTTP instead of in-process")
+    parser.add_argument('--mongomock', action='store_true', help="Use an in-process mongomock stand-in")
+    parser.add_argument('--departments', type=int, default=10)
+    parser.add_argument('--lecturers-per-department', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=150)
+    parser.add_argument('--courses-per-lecturer', type=int, default=3)
+    parser.add_argument('--occupancy', type=float, default=0.7, help="Fraction of room slots booked")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        if args.base_url:
+            parser.error("--mongomock only works in-process; seed the server's database instead")
+        import mongomock
+        database.set_client(mongomock.MongoClient(database.MONGO_URI))
+    elif database.get_db().name == database.DEFAULT_DATABASE:
+        parser.error("Seeding drops collections; point MONGO_URI at a scratch database such as "
+                     "mongodb://localhost:27017/timetable_loadtest")
+
+    data = seed(args.departments, args.lecturers_per_department, args.rooms,
+                args.courses_per_lecturer, args.occupancy)
+
+    if args.base_url:
+        make_session = lambda user: HttpSession(args.base_url, user)
+    else:
+        from app import app
+        make_session = lambda user: InProcessSession(app, user)
+
+    results, elapsed = run_load(make_session, data, args.users, args.duration)
+    report(results, elapsed)
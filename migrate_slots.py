@@ -0,0 +1,80 @@
+from pymongo import UpdateOne
+
+from database import timetable_collection, request_collection
+from slots import FIRST_HOUR, day_index, ensure_slot_indexes, parse_time, parse_timeslot, slot_fields, slot_in_day
+
+BATCH_SIZE = 1000
+
+
+# Rows that cannot be read are skipped and reported, never written half-converted
+UNREADABLE = (ValueError, KeyError, TypeError, AttributeError)
+
+
+def checked_slot(day_idx, start_slot, duration):
+    if not slot_in_day(start_slot, duration):
+        raise ValueError(f"slot outside the teaching day (start {start_slot}, duration {duration})")
+    return day_idx, start_slot, duration
+
+
+# Canonical slot fields for a stored entry written before the integer encoding existed
+def legacy_slot_fields(entry):
+    if 'start_hour' in entry:  # Written by algorithm1.store_timetable
+        return slot_fields(*checked_slot(
+            day_index(entry['day']),
+            entry['start_hour'] - FIRST_HOUR,
+            entry['end_hour'] - entry['start_hour']
+        ))
+    return slot_fields(*checked_slot(day_index(entry['day']), *parse_time(entry['time'])))
+
+
+def flush(collection, operations):
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        operations.clear()
+
+
+# One-shot migration of timetable entries and pending requests to day_index/start_slot/duration
+def migrate():
+    operations = []
+    migrated = 0
+    skipped = []
+    for entry in timetable_collection.find({'day_index': {'$exists': False}, 'day': {'$exists': True}}):
+        try:
+            fields = legacy_slot_fields(entry)
+        except UNREADABLE as e:
+            skipped.append(('timetables', entry['_id'], f"{entry.get('day')!r} {entry.get('time')!r}: {e}"))
+            continue
+        operations.append(UpdateOne(
+            {'_id': entry['_id']},
+            {'$set': fields, '$unset': {'start_hour': '', 'end_hour': ''}}
+        ))
+        migrated += 1
+        if len(operations) >= BATCH_SIZE:
+            flush(timetable_collection, operations)
+    flush(timetable_collection, operations)
+
+    for req in request_collection.find({'requested_slot': {'$exists': False}, 'timeslots': {'$nin': [None, '']}}):
+        try:
+            day_idx, start_slot, duration = checked_slot(*parse_timeslot(req['timeslots']))
+        except UNREADABLE as e:
+            skipped.append(('requests', req['_id'], f"{req['timeslots']!r}: {e}"))
+            continue
+        operations.append(UpdateOne(
+            {'_id': req['_id']},
+            {'$set': {'requested_slot': {'day_index': day_idx, 'start_slot': start_slot, 'duration': duration}}}
+        ))
+        if len(operations) >= BATCH_SIZE:
+            flush(request_collection, operations)
+    flush(request_collection, operations)
+
+    ensure_slot_indexes(timetable_collection)
+    print(f"Migrated {migrated} timetable entries to the integer slot encoding.")
+    if skipped:
+        print(f"Skipped {len(skipped)} rows that could not be read; fix them and run the migration again:")
+        for collection, doc_id, error in skipped:
+            print(f"  {collection} {doc_id}: {error}")
+    return {'migrated': migrated, 'skipped': skipped}
+
+
+if __name__ == '__main__':
+    migrate()
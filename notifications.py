@@ -0,0 +1,122 @@
+import datetime
+import os
+import queue
+import threading
+import time
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from database import get_db, LazyCollection
+
+# Server push of timetable changes. Write paths append an event to a small capped collection;
+# every web worker runs one thread tailing it and fans events out to its connected
+# server-sent-event clients, filtered by the lecturer, room or department they follow.
+EVENTS_COLLECTION = 'timetable_events'
+EVENTS_SIZE_BYTES = 1024 * 1024
+EVENTS_MAX = 1000
+SUBSCRIBER_QUEUE_SIZE = 100
+
+events_collection = LazyCollection(EVENTS_COLLECTION)
+_events_ready = {'pid': None}
+
+
+def ensure_events_collection():
+    if _events_ready['pid'] == os.getpid():
+        return
+    try:
+        get_db().create_collection(EVENTS_COLLECTION, capped=True, size=EVENTS_SIZE_BYTES, max=EVENTS_MAX)
+    except CollectionInvalid:
+        pass  # Already exists
+    _events_ready['pid'] = os.getpid()
+
+
+# Record a timetable change; everything=True for changes that affect every timetable
+def publish_event(kind, version=None, lecturers=(), rooms=(), departments=(), everything=False):
+    ensure_events_collection()
+    events_collection.insert_one({
+        'kind': kind,
+        'version': version,
+        'lecturers': sorted({l for l in lecturers if l}),
+        'rooms': sorted({r for r in rooms if r}),
+        'departments': sorted({d for d in departments if d}),
+        'everything': everything,
+        'created_at': datetime.datetime.now(),
+    })
+
+
+class Subscriber:
+    """One connected client and the timetables it follows."""
+
+    def __init__(self, lecturer=None, room=None, department=None, everything=False):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.lecturer = lecturer
+        self.room = room
+        self.department = department
+        self.everything = everything
+
+    def matches(self, event):
+        return (self.everything or event.get('everything')
+                or self.lecturer in event.get('lecturers', [])
+                or self.room in event.get('rooms', [])
+                or self.department in event.get('departments', []))
+
+
+class EventHub:
+    """Per-process fan-out of tailed timetable events to subscribers."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def subscribe(self, **filters):
+        subscriber = Subscriber(**filters)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            # Started on first use, and again in a forked worker since threads do not survive fork
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.tail, name='timetable-events', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def dispatch(self, event):
+        message = {key: event.get(key) for key in ('kind', 'version', 'lecturers', 'rooms', 'departments', 'everything')}
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if subscriber.matches(event):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except queue.Full:
+                    pass  # A client that stopped reading only misses notifications
+
+    def tail(self):
+        last_id = None
+        positioned = False
+        while True:
+            try:
+                ensure_events_collection()
+                if not positioned:
+                    # Only events published after this worker started listening are delivered
+                    newest = events_collection.find_one(sort=[('$natural', -1)])
+                    last_id = newest['_id'] if newest else None
+                    positioned = True
+                query = {'_id': {'$gt': last_id}} if last_id else {}
+                cursor = events_collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for event in cursor:
+                        last_id = event['_id']
+                        self.dispatch(event)
+            except PyMongoError as e:
+                print(f"Timetable event stream interrupted: {e}")
+            time.sleep(1)
+
+
+hub = EventHub()
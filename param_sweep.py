@@ -0,0 +1,89 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+
+import numpy as np
+
+from algorithm import DEFAULT_PARAMETERS, solve_problem
+from snapshot import load_snapshot
+
+# Grid search of GA parameters over benchmark snapshots (see snapshot.py), to pick defaults.
+# Every configuration, plus the adaptive mode, runs on every dataset with the same seeds.
+RESULT_FIELDS = ['dataset', 'config', 'seed', 'sol_per_pop', 'num_parents_mating', 'keep_parents',
+                 'mutation_probability', 'fitness', 'generations', 'seconds']
+
+
+def configurations(populations, parent_fractions, mutation_rates):
+    for sol_per_pop, parent_fraction, mutation_probability in itertools.product(populations, parent_fractions, mutation_rates):
+        yield f"pop{sol_per_pop}-par{parent_fraction}-mut{mutation_probability}", False, {
+            'sol_per_pop': sol_per_pop,
+            'num_parents_mating': max(2, int(sol_per_pop * parent_fraction)),
+            'keep_parents': max(1, sol_per_pop // 20),
+            'mutation_probability': mutation_probability,
+        }
+    yield 'adaptive', True, None
+
+
+def run_sweep(snapshot_paths, generations, seeds, populations, parent_fractions, mutation_rates):
+    results = []
+    for path in snapshot_paths:
+        courses_data, lecturer_data, room_data = load_snapshot(path).problem()
+        dataset = os.path.basename(path)
+        for name, adaptive, parameters in configurations(populations, parent_fractions, mutation_rates):
+            for seed in seeds:
+                random.seed(seed)
+                np.random.seed(seed)
+                stats = {}
+                started = time.perf_counter()
+                _, fitness = solve_problem(courses_data, lecturer_data, room_data, num_generations=generations,
+                                           adaptive=adaptive, parameters=parameters, stats=stats)
+                used = stats['parameters']
+                results.append({
+                    'dataset': dataset, 'config': name, 'seed': seed,
+                    'sol_per_pop': used['sol_per_pop'], 'num_parents_mating': used['num_parents_mating'],
+                    'keep_parents': used['keep_parents'], 'mutation_probability': used['mutation_probability'],
+                    'fitness': float(fitness), 'generations': stats['generations'],
+                    'seconds': round(time.perf_counter() - started, 3),
+                })
+    return results
+
+
+# Best configuration per dataset: highest mean fitness, then lowest mean time
+def summarise(results):
+    grouped = {}
+    for row in results:
+        grouped.setdefault((row['dataset'], row['config']), []).append(row)
+
+    best = {}
+    for (dataset, config), rows in grouped.items():
+        fitness = sum(r['fitness'] for r in rows) / len(rows)
+        seconds = sum(r['seconds'] for r in rows) / len(rows)
+        if dataset not in best or (fitness, -seconds) > (best[dataset][1], -best[dataset][2]):
+            best[dataset] = (config, fitness, seconds)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep GA parameters over benchmark snapshots")
+    parser.add_argument('snapshots', nargs='+', help="Snapshot files written by 'python snapshot.py export'")
+    parser.add_argument('--generations', type=int, default=500)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--populations', type=int, nargs='+', default=[50, 100, DEFAULT_PARAMETERS['sol_per_pop']])
+    parser.add_argument('--parent-fractions', type=float, nargs='+', default=[0.25])
+    parser.add_argument('--mutation-rates', type=float, nargs='+', default=[0.05, 0.1, DEFAULT_PARAMETERS['mutation_probability']])
+    parser.add_argument('--output', default='param_sweep.csv')
+    args = parser.parse_args()
+
+    results = run_sweep(args.snapshots, args.generations, args.seeds, args.populations,
+                        args.parent_fractions, args.mutation_rates)
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"Wrote {len(results)} runs to {args.output}")
+    for dataset, (config, fitness, seconds) in sorted(summarise(results).items()):
+        print(f"{dataset}: best {config} (mean fitness {fitness:.4f}, {seconds:.1f}s per run)")
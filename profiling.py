@@ -0,0 +1,97 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+
+# Opt-in profiling of timetable generation runs. Enabled per run from the generation form or
+# for every run with TIMETABLE_PROFILE=1; artifacts go to TIMETABLE_PROFILE_DIR.
+PROFILE_ENV = 'TIMETABLE_PROFILE'
+PROFILE_DIR = os.environ.get('TIMETABLE_PROFILE_DIR', 'profiles')
+
+# Solver stages, matched against (file name, function name) of profiled functions
+STAGES = [
+    ('fitness', lambda path, func: func in ('fitness_func', 'fitness')),
+    ('repair', lambda path, func: func == 'repair_solution'),
+    ('selection', lambda path, func: 'pygad' in path and func.endswith('_selection')),
+    ('crossover', lambda path, func: func == 'crossover' or ('pygad' in path and func.endswith('_crossover'))),
+    ('mutation', lambda path, func: func in ('mutation', 'mutate') or ('pygad' in path and func.endswith('_mutation'))),
+    ('mongo_fetch', lambda path, func: func in ('fetch_data', 'get_courses', 'get_rooms', 'get_users')),
+    ('mongo_save', lambda path, func: func in ('save_timetable_to_db', 'save_entries', 'store_timetable')),
+]
+
+
+# Only one cProfile profiler can be active per process (Python 3.12+ raises otherwise), so
+# concurrent runs in a threaded worker are profiled one at a time and the others skip profiling
+_profiling_lock = threading.Lock()
+
+
+def profiling_enabled(requested=False):
+    return requested or os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+class RunProfiler:
+    """cProfile a block of code and summarise where the time went by solver stage."""
+
+    def __init__(self, run_name, enabled=True, top=15):
+        self.run_name = run_name
+        self.enabled = enabled
+        self.top = top
+        self.profiler = None
+        self.summary = None
+        self.skipped = False  # Profiling was requested but another run was already being profiled
+
+    def __enter__(self):
+        if self.enabled:
+            if not _profiling_lock.acquire(blocking=False):
+                self.skipped = True
+                return self
+            self.started = time.perf_counter()
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:  # Another profiling tool is active in this process
+                self.profiler = None
+                self.skipped = True
+                _profiling_lock.release()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is None:
+            return False
+        self.profiler.disable()
+        _profiling_lock.release()
+        wall_seconds = time.perf_counter() - self.started
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        artifact = os.path.join(PROFILE_DIR, f"{self.run_name}.prof")
+        self.profiler.dump_stats(artifact)
+
+        self.summary = summarise(pstats.Stats(self.profiler), wall_seconds, self.top)
+        self.summary['artifact'] = artifact
+        with open(os.path.join(PROFILE_DIR, f"{self.run_name}.json"), 'w') as f:
+            json.dump(self.summary, f, indent=2)
+        return False
+
+
+# Cumulative seconds per stage (the largest entry point of each stage) plus the top functions
+def summarise(stats, wall_seconds, top):
+    stages = {stage: 0.0 for stage, _ in STAGES}
+    functions = []
+    for (path, line, func), (_, calls, own_time, cumulative, _) in stats.stats.items():
+        functions.append((cumulative, own_time, calls, f"{os.path.basename(path)}:{line}({func})"))
+        for stage, matches in STAGES:
+            if matches(path, func):
+                stages[stage] = max(stages[stage], cumulative)
+                break
+
+    functions.sort(reverse=True)
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'stages': {stage: round(seconds, 3) for stage, seconds in stages.items()},
+        'top_functions': [
+            {'function': name, 'calls': calls, 'own_seconds': round(own, 3), 'cumulative_seconds': round(cumulative, 3)}
+            for cumulative, own, calls, name in functions[:top]
+        ],
+    }
@@ -0,0 +1,134 @@
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from slots import covered_slots, parse_timeslot, slot_fields, slot_in_day
+
+# Fields needed from timetable entries when checking a batch for conflicts
+SLOT_PROJECTION = {'lecturer': 1, 'room': 1, 'department': 1, 'day_index': 1, 'start_slot': 1, 'duration': 1}
+
+
+# Requested (day_index, start_slot, duration) of a replacement request
+def requested_slot(req):
+    slot = req.get('requested_slot')
+    if slot:
+        return slot['day_index'], slot['start_slot'], slot['duration']
+    return parse_timeslot(req['timeslots'])
+
+
+# Evaluate a batch of replacement requests against the current timetable in a single pass.
+# Requests are taken in order, so when two requests in the same batch want the same room or
+# lecturer at the same time, the earlier one wins and the later one is reported as a conflict.
+def resolve_request_batch(requests, slots, timetable_entries):
+    # Occupancy of the current timetable, keyed by (room, day_index, slot) and (lecturer, day_index, slot)
+    room_booked = {}
+    lecturer_booked = {}
+    for entry in timetable_entries:
+        entry_id = str(entry['_id'])
+        for cell in covered_slots(entry):
+            room_booked[(entry.get('room'),) + cell] = entry_id
+            lecturer_booked[(entry.get('lecturer'),) + cell] = entry_id
+
+    accepted = []
+    conflicts = []
+    moves = {}  # slot_id -> ((day_index, start_slot, duration), room) for permanent replacements
+
+    for req in requests:
+        request_id = str(req['_id'])
+
+        if req.get('replacement_type') != 'permanent' or not req.get('timeslots'):
+            accepted.append(request_id)
+            continue
+
+        slot_id = req.get('slot_id')
+        slot = slots.get(slot_id)
+        if slot is None:
+            conflicts.append({'request_id': request_id, 'reason': 'Timetable slot not found'})
+            continue
+        if slot_id in moves:
+            conflicts.append({'request_id': request_id, 'reason': 'Slot already moved by another request in this batch'})
+            continue
+
+        try:
+            day_idx, start_slot, duration = requested_slot(req)
+            valid = slot_in_day(start_slot, duration)
+        except ValueError:
+            valid = False
+        if not valid:
+            conflicts.append({'request_id': request_id, 'reason': f"Invalid time slot {req['timeslots']!r}"})
+            continue
+        target = {'day_index': day_idx, 'start_slot': start_slot, 'duration': duration}
+        target_cells = covered_slots(target)
+        room = req.get('venue') or slot.get('room')  # The venue the lecturer asked for
+
+        if any(room_booked.get((room,) + cell, slot_id) != slot_id for cell in target_cells):
+            conflicts.append({'request_id': request_id, 'reason': f"Room {room} is booked on {req['timeslots']}"})
+            continue
+        if any(lecturer_booked.get((slot.get('lecturer'),) + cell, slot_id) != slot_id for cell in target_cells):
+            conflicts.append({'request_id': request_id, 'reason': f"Lecturer {slot.get('lecturer')} is booked on {req['timeslots']}"})
+            continue
+
+        # Release the old position and claim the new one so later requests see the move
+        for cell in covered_slots(slot):
+            room_booked.pop((slot.get('room'),) + cell, None)
+            lecturer_booked.pop((slot.get('lecturer'),) + cell, None)
+        for cell in target_cells:
+            room_booked[(room,) + cell] = slot_id
+            lecturer_booked[(slot.get('lecturer'),) + cell] = slot_id
+
+        moves[slot_id] = ((day_idx, start_slot, duration), room)
+        accepted.append(request_id)
+
+    return accepted, conflicts, moves
+
+
+# Apply a batch of replacement requests with one timetable bulk write and one status update.
+# Only entries of the given timetable version (see versions.py) are moved or checked for clashes.
+def accept_request_batch(request_ids, request_collection, timetable_collection, version_id=None):
+    # Ids that are not valid ObjectIds cannot match a request and are reported as not found
+    object_ids = [ObjectId(request_id) for request_id in request_ids if ObjectId.is_valid(request_id)]
+    requests = list(request_collection.find(
+        {'_id': {'$in': object_ids}, 'status': 'pending'}
+    ).sort('submitted_at', 1))
+
+    found = {str(req['_id']) for req in requests}
+    not_found = [request_id for request_id in request_ids if request_id not in found]
+
+    # Fetch the slots being moved, then everything booked for the same lecturers or in the old
+    # and requested rooms
+    slot_ids = [ObjectId(req['slot_id']) for req in requests
+                if req.get('replacement_type') == 'permanent' and ObjectId.is_valid(req.get('slot_id') or '')]
+    slots = {str(slot['_id']): slot for slot in timetable_collection.find(
+        {'_id': {'$in': slot_ids}, 'version_id': version_id}, SLOT_PROJECTION
+    )}
+
+    rooms = list({slot.get('room') for slot in slots.values()} | {req['venue'] for req in requests if req.get('venue')})
+    lecturers = list({slot.get('lecturer') for slot in slots.values()})
+    timetable_entries = list(timetable_collection.find(
+        {'version_id': version_id, '$or': [{'room': {'$in': rooms}}, {'lecturer': {'$in': lecturers}}]}, SLOT_PROJECTION
+    )) if slots else []
+
+    accepted, conflicts, moves = resolve_request_batch(requests, slots, timetable_entries)
+
+    if moves:
+        timetable_collection.bulk_write([
+            UpdateOne({'_id': ObjectId(slot_id)}, {'$set': dict(slot_fields(*target), room=room)})
+            for slot_id, (target, room) in moves.items()
+        ], ordered=False)
+
+    if accepted:
+        request_collection.update_many(
+            {'_id': {'$in': [ObjectId(request_id) for request_id in accepted]}},
+            {'$set': {'status': 'Accepted'}}
+        )
+
+    # Timetables touched by the moves, for change notifications
+    moved_slots = [slots[slot_id] for slot_id in moves]
+    moved_rooms = {slot.get('room') for slot in moved_slots} | {room for _, room in moves.values()}
+    affected = {
+        'lecturers': sorted({slot.get('lecturer') for slot in moved_slots if slot.get('lecturer')}),
+        'rooms': sorted(room for room in moved_rooms if room),
+        'departments': sorted({slot.get('department') for slot in moved_slots if slot.get('department')}),
+    }
+
+    return {'accepted': accepted, 'conflicts': conflicts, 'not_found': not_found, 'moved': len(moves),
+            'affected': affected}
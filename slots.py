@@ -0,0 +1,81 @@
+from pymongo import ASCENDING
+
+# Canonical slot encoding for stored timetable entries:
+#   day_index  - 0 (Monday) to 4 (Friday)
+#   start_slot - hours after FIRST_HOUR, so 0 is 8:00 and 6 is 14:00
+#   duration   - length of the session in hours
+# The 'day' and 'time' strings are derived from these only for display.
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+FIRST_HOUR = 8
+SLOTS_PER_DAY = 10  # 8:00 - 18:00
+AVAILABILITY_DAYS = [day.lower() for day in DAYS]  # Keys of a lecturer's availability dict
+
+# Indexes used by the read paths (per lecturer/room/department) and by range queries
+# such as "everything after 14:00 on Wednesday"; reads are always within one timetable
+# version (see versions.py), so every index leads with version_id
+SLOT_INDEXES = [
+    [('version_id', ASCENDING), ('day_index', ASCENDING), ('start_slot', ASCENDING)],
+    [('version_id', ASCENDING), ('room', ASCENDING), ('day_index', ASCENDING), ('start_slot', ASCENDING)],
+    [('version_id', ASCENDING), ('lecturer', ASCENDING), ('day_index', ASCENDING), ('start_slot', ASCENDING)],
+    [('version_id', ASCENDING), ('department', ASCENDING), ('day_index', ASCENDING), ('start_slot', ASCENDING)],
+]
+
+
+def day_index(day):
+    return [d.lower() for d in DAYS].index(day.strip().lower())
+
+
+def format_time(start_slot, duration=1):
+    return f"{FIRST_HOUR + start_slot}:00 - {FIRST_HOUR + start_slot + duration}:00"
+
+
+# Parse a time range such as '13:00 - 14:00' or '08:00-10:00' into (start_slot, duration)
+def parse_time(time_range):
+    start, end = (int(t.strip().split(':')[0]) for t in time_range.split('-'))
+    return start - FIRST_HOUR, end - start
+
+
+# Parse a requested slot such as 'Wednesday 13:00 - 14:00' into (day_index, start_slot, duration)
+def parse_timeslot(label):
+    day, time_range = label.split(' ', 1)
+    return (day_index(day),) + parse_time(time_range)
+
+
+# Whether a (start_slot, duration) is a non-empty range inside the teaching day
+def slot_in_day(start_slot, duration):
+    return 0 <= start_slot and duration > 0 and start_slot + duration <= SLOTS_PER_DAY
+
+
+# Fields stored on a timetable entry for the given slot, including the display strings
+def slot_fields(day_idx, start_slot, duration=1):
+    return {
+        "day_index": day_idx,
+        "start_slot": start_slot,
+        "duration": duration,
+        "day": DAYS[day_idx],
+        "time": format_time(start_slot, duration),
+    }
+
+
+# Hourly (day_index, slot) cells covered by a stored entry
+def covered_slots(entry):
+    return [(entry['day_index'], slot)
+            for slot in range(entry['start_slot'], entry['start_slot'] + entry.get('duration', 1))]
+
+
+# Indexes created before entries were versioned; every read now filters on version_id, so
+# these are never used and only slow down inserts
+LEGACY_SLOT_INDEXES = [[(field, ASCENDING) for field, _ in keys[1:]] for keys in SLOT_INDEXES]
+
+
+def index_name(keys):
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+def ensure_slot_indexes(collection):
+    existing = collection.index_information()
+    for keys in LEGACY_SLOT_INDEXES:
+        if index_name(keys) in existing:
+            collection.drop_index(index_name(keys))
+    for keys in SLOT_INDEXES:
+        collection.create_index(keys)
@@ -0,0 +1,168 @@
+import argparse
+import datetime
+
+import numpy as np
+
+from slots import AVAILABILITY_DAYS, FIRST_HOUR, SLOTS_PER_DAY, parse_time
+
+# Versioned, offline copy of the scheduling problem (courses, rooms, lecturers and their
+# availability) stored as flat NumPy arrays in an uncompressed .npz. Solver workers and
+# benchmarks load it instead of querying MongoDB and decoding BSON.
+SNAPSHOT_VERSION = 1
+
+
+def _strings(values):
+    return np.array([str(v) if v is not None else '' for v in values], dtype=np.str_)
+
+
+# Lecturer availability as a [day, slot] boolean grid
+def availability_grid(availability):
+    grid = np.zeros((len(AVAILABILITY_DAYS), SLOTS_PER_DAY), dtype=bool)
+    for day, times in (availability or {}).items():
+        if day not in AVAILABILITY_DAYS:
+            continue
+        for time_range in (times if isinstance(times, list) else [times]):
+            if not time_range:
+                continue
+            start_slot, duration = parse_time(time_range)
+            grid[AVAILABILITY_DAYS.index(day), max(start_slot, 0):max(start_slot + duration, 0)] = True
+    return grid
+
+
+# Availability dict in the shape stored on user documents, e.g. {'monday': ['9:00-11:00']}
+def availability_ranges(grid):
+    availability = {}
+    for day_idx, day in enumerate(AVAILABILITY_DAYS):
+        ranges = []
+        slot = 0
+        while slot < SLOTS_PER_DAY:
+            if grid[day_idx, slot]:
+                end = slot
+                while end < SLOTS_PER_DAY and grid[day_idx, end]:
+                    end += 1
+                ranges.append(f"{FIRST_HOUR + slot}:00-{FIRST_HOUR + end}:00")
+                slot = end
+            else:
+                slot += 1
+        availability[day] = ranges
+    return availability
+
+
+def write_snapshot(path, courses, lecturers, rooms):
+    with open(path, 'wb') as f:
+        np.savez(
+            f,
+            version=SNAPSHOT_VERSION,
+            created_at=datetime.datetime.now().isoformat(timespec='seconds'),
+            course_id=_strings(c.get('_id') for c in courses),
+            course_code=_strings(c.get('course_code') for c in courses),
+            course_name=_strings(c.get('course_name') for c in courses),
+            course_lecturer=_strings(c.get('lecturer') for c in courses),
+            course_department=_strings(c.get('department') for c in courses),
+            credit_hours=np.array([c.get('credit_hours', 0) for c in courses], dtype=np.int32),
+            lab_hours=np.array([c.get('lab_hours', 0) for c in courses], dtype=np.int32),
+            student_count=np.array([c.get('student_count', 0) for c in courses], dtype=np.int32),
+            room_id=_strings(r.get('_id') for r in rooms),
+            room_name=_strings(r.get('room_name') for r in rooms),
+            room_type=_strings(r.get('room_type') for r in rooms),
+            room_capacity=np.array([r.get('capacity', 0) for r in rooms], dtype=np.int32),
+            lecturer_id=_strings(l.get('_id') for l in lecturers),
+            lecturer_username=_strings(l.get('username') for l in lecturers),
+            lecturer_department=_strings(l.get('department') for l in lecturers),
+            lecturer_availability=np.array(
+                [availability_grid(l.get('availability')) for l in lecturers], dtype=bool
+            ).reshape(len(lecturers), len(AVAILABILITY_DAYS), SLOTS_PER_DAY),
+        )
+
+
+# Export the live scheduling problem from MongoDB
+def export_snapshot(path):
+    from database import courses_collection, users_collection, rooms_collection
+
+    courses = list(courses_collection.find())
+    lecturers = list(users_collection.find({'role': 'lecturer'}))
+    rooms = list(rooms_collection.find())
+    write_snapshot(path, courses, lecturers, rooms)
+    return len(courses), len(lecturers), len(rooms)
+
+
+class Snapshot:
+    """Scheduling problem loaded from a snapshot file."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.version = int(arrays['version'])
+        self.created_at = str(arrays['created_at'])
+
+    # Documents in the same shape as the live collections, so both engines accept them unchanged
+    def courses(self):
+        a = self.arrays
+        return [{
+            '_id': a['course_id'][i],
+            'course_code': a['course_code'][i],
+            'course_name': a['course_name'][i],
+            'lecturer': a['course_lecturer'][i],
+            'credit_hours': int(a['credit_hours'][i]),
+            'lab_hours': int(a['lab_hours'][i]),
+            'student_count': int(a['student_count'][i]),
+            'department': a['course_department'][i],
+        } for i in range(len(a['course_id']))]
+
+    def lecturers(self):
+        a = self.arrays
+        return [{
+            '_id': a['lecturer_id'][i],
+            'username': a['lecturer_username'][i],
+            'role': 'lecturer',
+            'department': a['lecturer_department'][i],
+            'availability': availability_ranges(a['lecturer_availability'][i]),
+        } for i in range(len(a['lecturer_id']))]
+
+    def rooms(self):
+        a = self.arrays
+        return [{
+            '_id': a['room_id'][i],
+            'room_name': a['room_name'][i],
+            'room_type': a['room_type'][i],
+            'capacity': int(a['room_capacity'][i]),
+        } for i in range(len(a['room_id']))]
+
+    # (courses_data, lecturer_data, room_data), the same triple as algorithm.fetch_data()
+    def problem(self):
+        return self.courses(), self.lecturers(), self.rooms()
+
+
+def load_snapshot(path):
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    # Plain str instead of np.str_ so documents compare and serialise like the live ones
+    for name, array in arrays.items():
+        if array.dtype.kind == 'U':
+            arrays[name] = array.tolist() if array.ndim else str(array)
+    if int(arrays['version']) != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {int(arrays['version'])} in {path}")
+    return Snapshot(arrays)
+
+
+# Accept a Snapshot, a snapshot path or None (meaning: use the live database)
+def resolve_snapshot(snapshot):
+    if snapshot is None or isinstance(snapshot, Snapshot):
+        return snapshot
+    return load_snapshot(snapshot)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export or inspect an offline scheduling problem snapshot")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('export', help="Write the live problem to a snapshot").add_argument('path')
+    subparsers.add_parser('info', help="Summarise a snapshot").add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        courses, lecturers, rooms = export_snapshot(args.path)
+        print(f"Wrote {courses} courses, {lecturers} lecturers and {rooms} rooms to {args.path}")
+    else:
+        snapshot = load_snapshot(args.path)
+        courses, lecturers, rooms = snapshot.problem()
+        print(f"Snapshot v{snapshot.version} from {snapshot.created_at}: "
+              f"{len(courses)} courses, {len(lecturers)} lecturers, {len(rooms)} rooms")
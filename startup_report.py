@@ -0,0 +1,66 @@
+import argparse
+import subprocess
+import sys
+
+# Modules that belong to the solver stack and should not be loaded by a web worker at boot
+SOLVER_MODULES = ['pygad', 'numpy', 'algorithm', 'algorithm1']
+
+
+# Import a module in a fresh interpreter with -X importtime and collect
+# (module, self_us, cumulative_us, depth), where depth 0 is a top-level import
+def measure_imports(module):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+
+# Timings of the modules imported directly by module (its depth-1 children; -X importtime lists
+# children before their parent), and module's own cumulative time
+def direct_imports(timings, module):
+    target = max((i for i, t in enumerate(timings) if t[0] == module and t[3] == 0), default=None)
+    if target is None:
+        return [], 0
+    children = []
+    for timing in reversed(timings[:target]):
+        if timing[3] == 0:
+            break  # Belongs to an earlier top-level import, e.g. interpreter startup
+        if timing[3] == 1:
+            children.append(timing)
+    return children, timings[target][2]
+
+
+def report(module, top):
+    timings = measure_imports(module)
+    children, total_us = direct_imports(timings, module)
+
+    print(f"Startup import cost of '{module}': {total_us / 1000:.1f} ms across {len(timings)} modules")
+    print(f"{'imported by ' + module:<40}{'self ms':>10}{'cumulative ms':>16}")
+    for name, self_us, cumulative_us, _ in sorted(children, key=lambda t: t[2], reverse=True)[:top]:
+        print(f"{name:<40}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}")
+
+    loaded = {name for name, _, _, _ in timings}
+    eager = [name for name in SOLVER_MODULES if name in loaded]
+    if eager:
+        print(f"Solver modules imported at startup: {', '.join(eager)}")
+    else:
+        print("No solver modules imported at startup.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report per-module import cost of the web app at startup")
+    parser.add_argument('module', nargs='?', default='app', help="Module to import (default: app)")
+    parser.add_argument('--top', type=int, default=20, help="Number of direct imports to list")
+    args = parser.parse_args()
+    report(args.module, args.top)
@@ -0,0 +1,248 @@
+import argparse
+import datetime
+import threading
+import time
+
+from bson.objectid import ObjectId
+from pymongo import DESCENDING
+
+from database import ensure_indexes, timetable_collection, versions_collection
+
+# Timetable versions. Every generation run (or other bulk write) stores its entries under a new
+# version id as a draft; publishing a version archives the previously published one. Readers
+# only ever query the published ("active") version, so the entries of older runs stay out of
+# their queries, and old archived versions are compacted down to their summary document.
+DRAFT = 'draft'
+PUBLISHED = 'published'
+ARCHIVED = 'archived'
+
+KEEP_ARCHIVED = 5           # Archived versions whose entries are kept for diffing and rollback
+DRAFT_RETENTION_DAYS = 14   # Unpublished drafts older than this are deleted
+ACTIVE_CACHE_SECONDS = 2    # How long a worker trusts its cached active version id
+
+# Fields compared when diffing two versions
+DIFF_PROJECTION = {'_id': 0, 'course': 1, 'lecturer': 1, 'department': 1, 'room': 1,
+                   'day_index': 1, 'start_slot': 1, 'duration': 1}
+
+
+def as_version_id(version_id):
+    return version_id if isinstance(version_id, ObjectId) else ObjectId(version_id)
+
+
+# Start a new draft version; extra fields (fitness, profile, ...) are stored on the version document
+def create_version(source, **details):
+    now = datetime.datetime.now()
+    version = dict(details, status=DRAFT, source=source, created_at=now, entry_count=0)
+    return versions_collection.insert_one(version).inserted_id
+
+
+# Store timetable entries under a version
+def save_version_entries(version_id, entries):
+    for entry in entries:
+        entry['version_id'] = version_id
+    if entries:
+        timetable_collection.insert_many(entries)
+    versions_collection.update_one({'_id': version_id}, {'$inc': {'entry_count': len(entries)}})
+
+
+def update_version(version_id, **details):
+    versions_collection.update_one({'_id': as_version_id(version_id)}, {'$set': details})
+
+
+_active = {'version_id': None, 'checked': 0.0}
+_active_lock = threading.Lock()
+
+
+# Make a version the one readers see, archiving the previously published version
+def publish_version(version_id):
+    version_id = as_version_id(version_id)
+    version = versions_collection.find_one({'_id': version_id}, {'status': 1, 'compacted': 1})
+    if version is None or version.get('compacted'):
+        return False
+
+    now = datetime.datetime.now()
+    versions_collection.update_many(
+        {'status': PUBLISHED, '_id': {'$ne': version_id}},
+        {'$set': {'status': ARCHIVED, 'archived_at': now}}
+    )
+    versions_collection.update_one({'_id': version_id}, {'$set': {'status': PUBLISHED, 'published_at': now}})
+    with _active_lock:
+        _active.update(version_id=version_id, checked=time.monotonic())
+    return True
+
+
+# Id of the published version, cached for a few seconds per worker since every read path needs it
+def active_version_id():
+    with _active_lock:
+        if time.monotonic() - _active['checked'] < ACTIVE_CACHE_SECONDS:
+            return _active['version_id']
+    version = versions_collection.find_one({'status': PUBLISHED}, {'_id': 1}, sort=[('published_at', DESCENDING)])
+    with _active_lock:
+        _active.update(version_id=version['_id'] if version else None, checked=time.monotonic())
+        return _active['version_id']
+
+
+# Query restricted to the active version. Before any version is published this matches the
+# entries stored without a version id (see migrate_unversioned).
+def active_query(query=None):
+    return dict(query or {}, version_id=active_version_id())
+
+
+def list_versions(limit=50):
+    return list(versions_collection.find({}, {'profile': 0}).sort('created_at', DESCENDING).limit(limit))
+
+
+# Entries written by older versions of algorithm1.store_timetable hold the whole course document
+def course_name(course):
+    if isinstance(course, dict):
+        return course.get('course_name') or course.get('course_code')
+    return course
+
+
+# Placements of every course in both versions, in a single indexed query
+def _placements(version_a, version_b):
+    placements = {version_a: {}, version_b: {}}
+    for entry in timetable_collection.find({'version_id': {'$in': [version_a, version_b]}},
+                                           dict(DIFF_PROJECTION, version_id=1)):
+        key = (course_name(entry.get('course')), entry.get('lecturer'))
+        slot = (entry['day_index'], entry['start_slot'], entry.get('duration', 1), entry.get('room'))
+        placements[entry['version_id']].setdefault(key, []).append((slot, entry.get('department')))
+    return placements[version_a], placements[version_b]
+
+
+def _session(course, lecturer, department, slot):
+    day_idx, start_slot, duration, room = slot
+    return {'course': course, 'lecturer': lecturer, 'department': department, 'room': room,
+            'day_index': day_idx, 'start_slot': start_slot, 'duration': duration}
+
+
+# Sessions moved, added and removed going from version_a to version_b. Per course, sessions at the
+# same time in the same room are unchanged; the remaining ones are paired up in time order as moves,
+# and whatever is left over was added (only in version_b) or removed (only in version_a).
+def diff_versions(version_a, version_b):
+    version_a, version_b = as_version_id(version_a), as_version_id(version_b)
+    old, new = _placements(version_a, version_b)
+    moved, added, removed = [], [], []
+    unchanged = 0
+
+    for key in sorted(set(old) | set(new), key=lambda k: tuple(str(part) for part in k)):
+        course, lecturer = key
+        old_slots = sorted(old.get(key, []), key=lambda s: s[0][:3])
+        new_slots = sorted(new.get(key, []), key=lambda s: s[0][:3])
+        new_remaining = list(new_slots)
+        old_remaining = []
+        for slot, department in old_slots:
+            match = next((i for i, (other, _) in enumerate(new_remaining) if other == slot), None)
+            if match is None:
+                old_remaining.append((slot, department))
+            else:
+                new_remaining.pop(match)
+                unchanged += 1
+
+        for (old_slot, old_department), (new_slot, new_department) in zip(old_remaining, new_remaining):
+            moved.append({
+                'from': _session(course, lecturer, old_department, old_slot),
+                'to': _session(course, lecturer, new_department, new_slot),
+            })
+        pairs = min(len(old_remaining), len(new_remaining))
+        removed += [_session(course, lecturer, department, slot) for slot, department in old_remaining[pairs:]]
+        added += [_session(course, lecturer, department, slot) for slot, department in new_remaining[pairs:]]
+
+    return {'from': str(version_a), 'to': str(version_b), 'moved': moved, 'added': added,
+            'removed': removed, 'unchanged': unchanged}
+
+
+# Version published before the given one (or before the active one), for the default diff
+def previous_version_id(version_id=None):
+    version_id = as_version_id(version_id) if version_id else active_version_id()
+    version = versions_collection.find_one({'_id': version_id}, {'published_at': 1}) if version_id else None
+    if not version or not version.get('published_at'):
+        return None
+    previous = versions_collection.find_one(
+        {'published_at': {'$lt': version['published_at']}}, {'_id': 1}, sort=[('published_at', DESCENDING)]
+    )
+    return previous['_id'] if previous else None
+
+
+# Retention: delete the entries of all but the newest keep_archived archived versions (their
+# summary document, with fitness and entry count, is kept), and delete stale drafts outright
+def compact_versions(keep_archived=KEEP_ARCHIVED, draft_retention_days=DRAFT_RETENTION_DAYS):
+    archived = [v['_id'] for v in versions_collection.find(
+        {'status': ARCHIVED, 'compacted': {'$ne': True}}, {'_id': 1}
+    ).sort('archived_at', DESCENDING)]
+    expired = archived[keep_archived:]
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=draft_retention_days)
+    drafts = [v['_id'] for v in versions_collection.find(
+        {'status': DRAFT, 'created_at': {'$lt': cutoff}}, {'_id': 1}
+    )]
+
+    deleted = 0
+    if expired or drafts:
+        deleted = timetable_collection.delete_many({'version_id': {'$in': expired + drafts}}).deleted_count
+    if expired:
+        versions_collection.update_many(
+            {'_id': {'$in': expired}},
+            {'$set': {'compacted': True, 'compacted_at': datetime.datetime.now()}}
+        )
+    if drafts:
+        versions_collection.delete_many({'_id': {'$in': drafts}})
+
+    return {'compacted': len(expired), 'drafts_deleted': len(drafts), 'entries_deleted': deleted}
+
+
+# One-shot migration of the pre-versioning layout: the slot entries become one published
+# 'legacy' version, and the per-run summary documents become compacted archived versions
+def migrate_unversioned():
+    summaries = list(timetable_collection.find({'timetable': {'$exists': True}}, {'fitness': 1}))
+    for summary in summaries:
+        created_at = summary['_id'].generation_time.replace(tzinfo=None)
+        versions_collection.insert_one({
+            'status': ARCHIVED, 'source': 'legacy-summary', 'fitness': summary.get('fitness'),
+            'created_at': created_at, 'archived_at': created_at, 'entry_count': 0, 'compacted': True,
+        })
+    if summaries:
+        timetable_collection.delete_many({'_id': {'$in': [summary['_id'] for summary in summaries]}})
+
+    legacy = {'version_id': {'$exists': False}, 'day_index': {'$exists': True}}
+    count = timetable_collection.count_documents(legacy)
+    if count:
+        version_id = create_version('legacy')
+        timetable_collection.update_many(legacy, {'$set': {'version_id': version_id}})
+        update_version(version_id, entry_count=count)
+        if active_version_id() is None:
+            publish_version(version_id)
+
+    ensure_indexes()
+    return {'summaries': len(summaries), 'entries': count}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manage timetable versions")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List the newest versions")
+    commands.add_parser('migrate', help="Move unversioned timetable entries into a 'legacy' version")
+    publish_parser = commands.add_parser('publish', help="Publish a version")
+    publish_parser.add_argument('version_id')
+    diff_parser = commands.add_parser('diff', help="Summarise the changes between two versions")
+    diff_parser.add_argument('version_a')
+    diff_parser.add_argument('version_b')
+    compact_parser = commands.add_parser('compact', help="Apply the retention policy")
+    compact_parser.add_argument('--keep', type=int, default=KEEP_ARCHIVED)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for version in list_versions():
+            print(f"{version['_id']}  {version['status']:<9}  {version['created_at']:%Y-%m-%d %H:%M}  "
+                  f"{version.get('source', '')}  entries={version.get('entry_count', 0)}  fitness={version.get('fitness')}")
+    elif args.command == 'migrate':
+        result = migrate_unversioned()
+        print(f"Moved {result['entries']} entries and {result['summaries']} run summaries into versions")
+    elif args.command == 'publish':
+        print("Published" if publish_version(args.version_id) else "Version not found or compacted")
+    elif args.command == 'diff':
+        diff = diff_versions(args.version_a, args.version_b)
+        print(f"{len(diff['moved'])} moved, {len(diff['added'])} added, {len(diff['removed'])} removed, "
+              f"{diff['unchanged']} unchanged")
+    else:
+        print(compact_versions(keep_archived=args.keep))